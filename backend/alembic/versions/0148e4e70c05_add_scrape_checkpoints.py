@@ -0,0 +1,39 @@
+"""Add scrape_checkpoints for incremental, resumable scraping
+
+Revision ID: 0148e4e70c05
+Revises: 93d824ad0140
+Create Date: 2026-10-17 15:05:48.220791
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0148e4e70c05'
+down_revision = '93d824ad0140'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('scrape_checkpoints',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('station', sa.String(), nullable=True),
+    sa.Column('page_url', sa.String(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=True),
+    sa.Column('etag', sa.String(), nullable=True),
+    sa.Column('last_modified', sa.String(), nullable=True),
+    sa.Column('items', sa.JSON(), nullable=True),
+    sa.Column('run_id', sa.String(length=32), nullable=True),
+    sa.Column('complete', sa.Boolean(), nullable=False),
+    sa.Column('fetched_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_scrape_checkpoints_date_url', 'scrape_checkpoints', ['date', 'page_url'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_scrape_checkpoints_date_url', table_name='scrape_checkpoints')
+    op.drop_table('scrape_checkpoints')
@@ -0,0 +1,30 @@
+"""Add menu_state so every worker shares one menu version
+
+Revision ID: 3c9a1f6d2b84
+Revises: e41a6c9b2f70
+Create Date: 2026-10-17 20:41:09.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a1f6d2b84'
+down_revision = 'e41a6c9b2f70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    menu_state = op.create_table('menu_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.String(length=32), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(menu_state, [{'id': 1, 'version': '1'}])
+
+
+def downgrade() -> None:
+    op.drop_table('menu_state')
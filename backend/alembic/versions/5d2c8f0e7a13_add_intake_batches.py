@@ -0,0 +1,35 @@
+"""Add intake_batches for idempotent batch intake logging
+
+Revision ID: 5d2c8f0e7a13
+Revises: b7e3d91c4a25
+Create Date: 2026-10-17 17:20:31.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2c8f0e7a13'
+down_revision = 'b7e3d91c4a25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('intake_batches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('idempotency_key', sa.String(length=255), nullable=False),
+    sa.Column('request_hash', sa.String(length=64), nullable=False),
+    sa.Column('response', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_intake_batches_user_key', 'intake_batches', ['user_id', 'idempotency_key'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_intake_batches_user_key', table_name='intake_batches')
+    op.drop_table('intake_batches')
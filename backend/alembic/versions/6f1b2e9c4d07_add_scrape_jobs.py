@@ -0,0 +1,41 @@
+"""Add scrape_jobs so every worker shares scrape job state
+
+Revision ID: 6f1b2e9c4d07
+Revises: 3c9a1f6d2b84
+Create Date: 2026-10-17 22:05:47.310264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1b2e9c4d07'
+down_revision = '3c9a1f6d2b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('scrape_jobs',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('active', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('progress_done', sa.Integer(), nullable=False),
+    sa.Column('progress_total', sa.Integer(), nullable=True),
+    sa.Column('message', sa.String(), nullable=True),
+    sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_scrape_jobs_active', 'scrape_jobs', ['active'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_scrape_jobs_active', table_name='scrape_jobs')
+    op.drop_table('scrape_jobs')
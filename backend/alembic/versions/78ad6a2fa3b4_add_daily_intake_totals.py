@@ -0,0 +1,51 @@
+"""Add daily_intake_totals rollup table
+
+Revision ID: 78ad6a2fa3b4
+Revises: cac8eabcd314
+Create Date: 2026-10-17 11:02:17.334905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '78ad6a2fa3b4'
+down_revision = 'cac8eabcd314'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_intake_totals',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('meals_logged', sa.Integer(), nullable=False),
+    sa.Column('calories', sa.Float(), nullable=False),
+    sa.Column('protein', sa.Float(), nullable=False),
+    sa.Column('carbs', sa.Float(), nullable=False),
+    sa.Column('fat', sa.Float(), nullable=False),
+    sa.Column('sodium', sa.Float(), nullable=False),
+    sa.Column('sugar', sa.Float(), nullable=False),
+    sa.Column('fiber', sa.Float(), nullable=False),
+    sa.Column('spent', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'date')
+    )
+    # Backfill from existing history; `python intake_totals.py rebuild` does the same later
+    op.execute(
+        "INSERT INTO daily_intake_totals "
+        "(user_id, date, meals_logged, calories, protein, carbs, fat, sodium, sugar, fiber, spent) "
+        "SELECT i.user_id, i.date, COUNT(i.id), "
+        "COALESCE(SUM(n.calories), 0), COALESCE(SUM(n.protein), 0), COALESCE(SUM(n.carbs), 0), "
+        "COALESCE(SUM(n.fat), 0), COALESCE(SUM(n.sodium), 0), COALESCE(SUM(n.sugar), 0), "
+        "COALESCE(SUM(n.fiber), 0), COALESCE(SUM(m.price), 0) "
+        "FROM intake_tracking i JOIN meals m ON m.id = i.meal_id "
+        "LEFT JOIN nutrients n ON n.id = (SELECT MIN(id) FROM nutrients WHERE meal_id = m.id) "
+        "WHERE i.user_id IS NOT NULL AND i.date IS NOT NULL "
+        "GROUP BY i.user_id, i.date"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_intake_totals')
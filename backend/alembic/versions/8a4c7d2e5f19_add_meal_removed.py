@@ -0,0 +1,25 @@
+"""Add meals.removed so dropped meals with history are detached, not kept on the menu
+
+Revision ID: 8a4c7d2e5f19
+Revises: 6f1b2e9c4d07
+Create Date: 2026-10-17 22:48:13.527930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4c7d2e5f19'
+down_revision = '6f1b2e9c4d07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('meals', sa.Column('removed', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('meals') as batch_op:
+        batch_op.drop_column('removed')
@@ -0,0 +1,25 @@
+"""Add meals.content_hash for change detection on re-scrape
+
+Revision ID: 93d824ad0140
+Revises: 78ad6a2fa3b4
+Create Date: 2026-10-17 13:40:05.912644
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '93d824ad0140'
+down_revision = '78ad6a2fa3b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('meals', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('meals') as batch_op:
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,33 @@
+"""Add a pg_trgm index for fuzzy meal search (PostgreSQL only)
+
+Revision ID: b7e3d91c4a25
+Revises: 0148e4e70c05
+Create Date: 2026-10-17 16:42:10.318557
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3d91c4a25'
+down_revision = '0148e4e70c05'
+branch_labels = None
+depends_on = None
+
+# Must stay identical to meal_search.SEARCH_DOCUMENT_SQL or the planner won't use the index
+SEARCH_DOCUMENT_SQL = "lower(name || ' ' || coalesce(station, '') || ' ' || coalesce(tags::text, ''))"
+
+
+def upgrade() -> None:
+    # SQLite searches through the in-memory index in meal_search instead
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(f"CREATE INDEX ix_meals_search_trgm ON meals USING gin (({SEARCH_DOCUMENT_SQL}) gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_meals_search_trgm")
@@ -0,0 +1,40 @@
+"""Add lookup indexes and unique favorites key
+
+Revision ID: cac8eabcd314
+Revises: a638050ff96c
+Create Date: 2026-10-17 09:12:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cac8eabcd314'
+down_revision = 'a638050ff96c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Drop duplicate favorites left behind by the old select-then-insert path,
+    # keeping the earliest row, so the unique index can be built
+    op.execute(
+        "DELETE FROM favorites WHERE id NOT IN ("
+        "SELECT MIN(id) FROM favorites GROUP BY user_id, meal_id)"
+    )
+    op.create_index('ix_meals_date_available', 'meals', ['date_available'], unique=False)
+    op.create_index('ix_nutrients_meal_id', 'nutrients', ['meal_id'], unique=False)
+    op.create_index('ix_allergens_meal_id', 'allergens', ['meal_id'], unique=False)
+    op.create_index('uq_favorites_user_meal', 'favorites', ['user_id', 'meal_id'], unique=True)
+    op.create_index('ix_intake_tracking_user_date', 'intake_tracking', ['user_id', 'date'], unique=False)
+    op.create_index('ix_user_preferences_user_id', 'user_preferences', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_preferences_user_id', table_name='user_preferences')
+    op.drop_index('ix_intake_tracking_user_date', table_name='intake_tracking')
+    op.drop_index('uq_favorites_user_meal', table_name='favorites')
+    op.drop_index('ix_allergens_meal_id', table_name='allergens')
+    op.drop_index('ix_nutrients_meal_id', table_name='nutrients')
+    op.drop_index('ix_meals_date_available', table_name='meals')
@@ -0,0 +1,34 @@
+"""Add meal_neighbors for precomputed item-item recommendations
+
+Revision ID: e41a6c9b2f70
+Revises: 5d2c8f0e7a13
+Create Date: 2026-10-17 18:05:12.477205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41a6c9b2f70'
+down_revision = '5d2c8f0e7a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('meal_neighbors',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('station', sa.String(), nullable=False),
+    sa.Column('neighbor_name', sa.String(), nullable=False),
+    sa.Column('neighbor_station', sa.String(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_meal_neighbors_dish', 'meal_neighbors', ['name', 'station'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_meal_neighbors_dish', table_name='meal_neighbors')
+    op.drop_table('meal_neighbors')
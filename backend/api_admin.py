@@ -1,28 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
-from selenium_scraper import scrape_and_save_selenium
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+from database import pool_stats
+from http_scraper import run_http_scrape
+from meal_search import refresh_search_index
+from menu_cache import bump_menu_version, menu_cache, invalidate_menu
+from scrape_jobs import ScrapeJobRunner
+from schemas import ScrapeJobSchema
 import logging
+import os
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 logger = logging.getLogger(__name__)
 
-@router.post("/scrape")
-def trigger_scraper(db: Session = Depends(get_db)):
-    """Trigger the Selenium-based scraper to get real meal data from McMaster dining site"""
+def run_selenium_scrape(job, db):
+    """Job target: run the legacy full-browser Selenium scraper against the McMaster dining site"""
+    from selenium_scraper import scrape_and_save_selenium
     try:
-        logger.info("Admin triggered Selenium scraper")
-        
-        # Use the new Selenium scraper
+        job.report(0, message="Running Selenium scraper")
         count = scrape_and_save_selenium(db)
-        
-        return {
-            "message": f"Selenium scraper completed successfully",
-            "meals_processed": count,
-            "scraper_type": "Selenium (interactive)"
-        }
-        
-    except Exception as e:
-        logger.error(f"Scraper failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Scraper failed: {str(e)}") 
\ No newline at end of file
+        job.report(1, 1, "Selenium scraper completed successfully")
+        return {"meals_processed": count, "scraper_type": "Selenium (interactive)"}
+    finally:
+        # Even a failed run may have saved some meals, so never keep the old menu
+        db.rollback()
+        bump_menu_version(db)
+        db.commit()
+        invalidate_menu()
+
+def with_search_refresh(scrape):
+    """Wrap a job target so the in-memory search index is rebuilt while the job still runs"""
+    def run(job, db):
+        result = scrape(job, db)
+        refresh_search_index(db)
+        return result
+    return run
+
+# The full-browser scraper stays the default until the HTTP parser has been checked
+# against recorded pages from the live site; SCRAPER_ENGINE=http opts in to it
+SCRAPER_ENGINE = os.getenv("SCRAPER_ENGINE", "selenium")
+scrape_runner = ScrapeJobRunner(with_search_refresh(run_selenium_scrape if SCRAPER_ENGINE == "selenium" else run_http_scrape))
+
+@router.post("/scrape", response_model=ScrapeJobSchema, status_code=202)
+async def trigger_scraper():
+    """Queue a scrape of the McMaster dining site; returns the already active job if there is one"""
+    job, created = await run_in_threadpool(scrape_runner.submit)
+    if created:
+        logger.info(f"Admin queued scrape job {job['job_id']}")
+        return job
+    return JSONResponse(status_code=200, content=jsonable_encoder(job))
+
+@router.get("/scrape/{job_id}", response_model=ScrapeJobSchema)
+async def get_scrape_job(job_id: str):
+    job = await run_in_threadpool(scrape_runner.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    return job
+
+@router.delete("/scrape/{job_id}", response_model=ScrapeJobSchema)
+async def cancel_scrape_job(job_id: str):
+    job = await run_in_threadpool(scrape_runner.cancel, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    return job
+
+@router.get("/cache")
+async def cache_stats():
+    """Hit/miss counters for the in-process menu cache"""
+    return menu_cache.stats()
+
+@router.get("/db")
+async def db_pool_stats():
+    """Connection pool occupancy, checkout counters and checkout wait times"""
+    return pool_stats()
@@ -1,18 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import datetime
+import logging
+import os
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import String, and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
-from database import SessionLocal
+from database import get_async_db
+from fields import ALLERGEN_FIELDS, NUTRIENT_FIELDS, escape_like
+from meal_search import search_meal_ids
+from menu_matrix import MenuMatrix, get_menu_matrix
+from menu_cache import load_menu_version, menu_cache, menu_etag
 from models import Meal, Nutrient, Allergen
-from schemas import MealSchema, MealListResponse
+from pagination import encode_cursor, decode_cursor
+from user_filters import get_user_filter
+from schemas import MealSchema, MealListResponse, MealFilters, MealSearchResponse, SimilarMealsResponse
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+logger = logging.getLogger(__name__)
 
 def get_real_mcmaster_meals():
     """Return real McMaster meal data scraped from the actual website"""
@@ -311,121 +318,297 @@ def get_real_mcmaster_meals():
         ]
     }
 
-@router.get("/meals", response_model=MealListResponse)
-def list_meals(date: Optional[str] = None, db: Session = Depends(get_db)):
-    try:
-        query = db.query(Meal)
-        if date:
-            query = query.filter(Meal.date_available == date)
-        
-        # Eagerly load relationships to avoid lazy loading issues
-        meals = query.all()
-        
-        # Convert to response format
-        meal_list = []
-        for meal in meals:
-            # Get nutrients
-            nutrients = db.query(Nutrient).filter(Nutrient.meal_id == meal.id).first()
-            nutrient_data = None
-            if nutrients:
-                nutrient_data = {
-                    "calories": nutrients.calories,
-                    "protein": nutrients.protein,
-                    "carbs": nutrients.carbs,
-                    "fat": nutrients.fat,
-                    "sodium": nutrients.sodium,
-                    "sugar": nutrients.sugar,
-                    "fiber": nutrients.fiber
-                }
-            
-            # Get allergens
-            allergens = db.query(Allergen).filter(Allergen.meal_id == meal.id).first()
-            allergen_data = None
-            if allergens:
-                allergen_data = {
-                    "peanuts": allergens.peanuts,
-                    "gluten": allergens.gluten,
-                    "dairy": allergens.dairy,
-                    "soy": allergens.soy,
-                    "egg": allergens.egg,
-                    "fish": allergens.fish,
-                    "shellfish": allergens.shellfish,
-                    "tree_nuts": allergens.tree_nuts,
-                    "sesame": allergens.sesame
-                }
-            
-            # Handle tags - convert string to list if needed
-            tags = meal.tags
-            if isinstance(tags, str):
-                tags = [tags] if tags else []
-            elif tags is None:
-                tags = []
-            
-            meal_data = {
-                "id": meal.id,
-                "name": meal.name,
-                "station": meal.station,
-                "serving_time": meal.serving_time,
-                "date_available": meal.date_available,
-                "price": meal.price,
-                "tags": tags,
-                "nutrients": nutrient_data,
-                "allergens": allergen_data
-            }
-            meal_list.append(meal_data)
-        
-        return {"meals": meal_list}
-    except Exception as e:
-        # If database is unavailable, return empty list
-        print(f"Database error: {str(e)}")
-        return {"meals": []}
-
-@router.get("/meals/{meal_id}", response_model=MealSchema)
-def get_meal(meal_id: int, db: Session = Depends(get_db)):
-    meal = db.query(Meal).filter(Meal.id == meal_id).first()
-    if not meal:
-        raise HTTPException(status_code=404, detail="Meal not found")
-    
-    # Get nutrients and allergens for this meal
-    nutrients = db.query(Nutrient).filter(Nutrient.meal_id == meal.id).first()
-    allergens = db.query(Allergen).filter(Allergen.meal_id == meal.id).first()
-    
+def _normalize_tags(tags):
     # Handle tags - convert string to list if needed
-    tags = meal.tags
     if isinstance(tags, str):
-        tags = [tags] if tags else []
-    elif tags is None:
-        tags = []
-    
-    # Convert to response format
-    meal_data = {
+        return [tags] if tags else []
+    if tags is None:
+        return []
+    return tags
+
+def meal_to_dict(meal):
+    """Convert a Meal whose nutrients/allergens are already loaded into the response format"""
+    nutrients = meal.nutrients[0] if meal.nutrients else None
+    allergens = meal.allergens[0] if meal.allergens else None
+    return {
         "id": meal.id,
         "name": meal.name,
         "station": meal.station,
         "serving_time": meal.serving_time,
         "date_available": meal.date_available,
         "price": meal.price,
-        "tags": tags,
-        "nutrients": {
-            "calories": nutrients.calories if nutrients else None,
-            "protein": nutrients.protein if nutrients else None,
-            "carbs": nutrients.carbs if nutrients else None,
-            "fat": nutrients.fat if nutrients else None,
-            "sodium": nutrients.sodium if nutrients else None,
-            "sugar": nutrients.sugar if nutrients else None,
-            "fiber": nutrients.fiber if nutrients else None
-        } if nutrients else None,
-        "allergens": {
-            "peanuts": allergens.peanuts if allergens else None,
-            "gluten": allergens.gluten if allergens else None,
-            "dairy": allergens.dairy if allergens else None,
-            "soy": allergens.soy if allergens else None,
-            "egg": allergens.egg if allergens else None,
-            "fish": allergens.fish if allergens else None,
-            "shellfish": allergens.shellfish if allergens else None,
-            "tree_nuts": allergens.tree_nuts if allergens else None,
-            "sesame": allergens.sesame if allergens else None
-        } if allergens else None
+        "tags": _normalize_tags(meal.tags),
+        "nutrients": {f: getattr(nutrients, f) for f in NUTRIENT_FIELDS} if nutrients else None,
+        "allergens": {f: getattr(allergens, f) for f in ALLERGEN_FIELDS} if allergens else None,
     }
-    
-    return meal_data 
\ No newline at end of file
+
+def meal_query():
+    # selectinload keeps the statement count fixed (meals + nutrients + allergens)
+    # no matter how many meals are returned, instead of two lookups per meal. It is
+    # also what makes the rows safe under AsyncSession, where lazy loads can't run
+    return select(Meal).options(selectinload(Meal.nutrients), selectinload(Meal.allergens))
+
+_MEAL_COLUMNS = (Meal.id, Meal.name, Meal.station, Meal.serving_time, Meal.date_available, Meal.price, Meal.tags)
+# Row layout: meal columns, Nutrient.id, nutrient values, Allergen.id, allergen flags
+_NUTRIENT_ID = len(_MEAL_COLUMNS)
+_ALLERGEN_ID = _NUTRIENT_ID + 1 + len(NUTRIENT_FIELDS)
+
+def meal_rows_query(include_removed: bool = False):
+    """One flat row per meal: meal columns, then its first nutrients and allergens rows.
+
+    The read endpoints serialize these tuples straight to JSON, skipping ORM
+    objects and Pydantic; meal_row_to_dict() keeps the MealSchema shape.
+    Meals dropped from their day's menu are left out unless include_removed
+    (favorites and lookups by id still need them).
+    """
+    first_nutrient = select(func.min(Nutrient.id)).where(Nutrient.meal_id == Meal.id).correlate(Meal).scalar_subquery()
+    first_allergen = select(func.min(Allergen.id)).where(Allergen.meal_id == Meal.id).correlate(Meal).scalar_subquery()
+    query = (
+        select(
+            *_MEAL_COLUMNS,
+            Nutrient.id, *[getattr(Nutrient, f) for f in NUTRIENT_FIELDS],
+            Allergen.id, *[getattr(Allergen, f) for f in ALLERGEN_FIELDS],
+        )
+        .select_from(Meal)
+        .outerjoin(Nutrient, Nutrient.id == first_nutrient)
+        .outerjoin(Allergen, Allergen.id == first_allergen)
+    )
+    return query if include_removed else query.where(Meal.removed == False)  # noqa: E712
+
+def _float(value):
+    # SQLite hands back whole-number REALs as int; MealSchema would emit them as floats
+    return None if value is None else float(value)
+
+def meal_row_to_dict(row) -> dict:
+    """MealSchema-shaped dict from a meal_rows_query() row (extra trailing columns are ignored)"""
+    meal_id, name, station, serving_time, date_available, price, tags = row[:_NUTRIENT_ID]
+    nutrients = allergens = None
+    if row[_NUTRIENT_ID] is not None:
+        nutrients = dict(zip(NUTRIENT_FIELDS, map(_float, row[_NUTRIENT_ID + 1:_ALLERGEN_ID])))
+    if row[_ALLERGEN_ID] is not None:
+        allergens = dict(zip(ALLERGEN_FIELDS, row[_ALLERGEN_ID + 1:_ALLERGEN_ID + 1 + len(ALLERGEN_FIELDS)]))
+    return {
+        "id": meal_id,
+        "name": name,
+        "station": station,
+        "serving_time": serving_time,
+        "date_available": date_available,
+        "price": _float(price),
+        "tags": _normalize_tags(tags),
+        "nutrients": nutrients,
+        "allergens": allergens,
+    }
+
+def dump_json(content) -> bytes:
+    """orjson encoding; dates come out as ISO strings, like Pydantic's"""
+    return orjson.dumps(content)
+
+SORT_FIELDS = ("id", "name", "price") + NUTRIENT_FIELDS
+
+def _sort_column(sort: str):
+    if sort == "id":
+        return Meal.id
+    if sort == "name":
+        return Meal.name
+    if sort == "price":
+        return func.coalesce(Meal.price, -1.0)
+    # Missing values sort as -1 so the keyset comparison never sees NULL
+    return func.coalesce(getattr(Nutrient, sort), -1.0)
+
+def _apply_filters(query, date: Optional[str], filters: MealFilters):
+    """Narrow a meal_rows_query(), which already joins the nutrients and allergens rows"""
+    if date:
+        query = query.filter(Meal.date_available == date)
+    if filters.station:
+        query = query.filter(Meal.station == filters.station)
+    if filters.serving_time:
+        query = query.filter(Meal.serving_time == filters.serving_time)
+    if filters.tag:
+        # tags is a JSON array; match the quoted element in its serialized form so
+        # the same filter works on both Postgres and the SQLite fallback
+        query = query.filter(Meal.tags.cast(String).like(f'%"{escape_like(filters.tag)}"%', escape="\\"))
+    if filters.min_price is not None:
+        query = query.filter(Meal.price >= filters.min_price)
+    if filters.max_price is not None:
+        query = query.filter(Meal.price <= filters.max_price)
+
+    nutrient_bounds = []
+    for field in NUTRIENT_FIELDS:
+        low = getattr(filters, f"min_{field}")
+        high = getattr(filters, f"max_{field}")
+        if low is not None:
+            nutrient_bounds.append(getattr(Nutrient, field) >= low)
+        if high is not None:
+            nutrient_bounds.append(getattr(Nutrient, field) <= high)
+    if nutrient_bounds:
+        query = query.filter(and_(*nutrient_bounds))
+
+    if filters.exclude_allergens:
+        excluded = [a.strip() for a in filters.exclude_allergens.split(",") if a.strip()]
+        unknown = [a for a in excluded if a not in ALLERGEN_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown allergens: {', '.join(unknown)}")
+        for allergen in excluded:
+            column = getattr(Allergen, allergen)
+            query = query.filter(or_(column.is_(None), column == False))  # noqa: E712
+    return query
+
+MENU_CACHE_CONTROL = f"public, max-age={int(os.getenv('MENU_MAX_AGE', '60'))}, must-revalidate"
+# Per-user bodies (e.g. /meals?for_user=) may only be kept by the user's own browser
+PRIVATE_CACHE_CONTROL = MENU_CACHE_CONTROL.replace("public", "private", 1)
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+async def _cached_json(request: Request, db: AsyncSession, key, build, cache_control: str = MENU_CACHE_CONTROL):
+    """Serve key from the menu cache, otherwise await build() for the JSON bytes and cache them.
+
+    Both the ETag and the cache entry carry the shared menu version, so a
+    matching If-None-Match is answered with 304 without building anything.
+    """
+    version = await load_menu_version(db)
+    headers = {"ETag": menu_etag(key, version), "Cache-Control": cache_control}
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    # A body built while another worker bumps the version stays under the old one
+    body = menu_cache.get((version, key))
+    if body is None:
+        body = await build()
+        menu_cache.set((version, key), body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/meals", response_model=MealListResponse)
+async def list_meals(
+    request: Request,
+    date: Optional[str] = None,
+    filters: MealFilters = Depends(),
+    sort: str = Query("id", pattern=f"^({'|'.join(SORT_FIELDS)})$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    for_user: Optional[int] = Query(None, description="Only meals this user's allergies, dietary tags and budget allow"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    after = decode_cursor(cursor, 3) if cursor else None
+    if after and after[0] != sort:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    user_filter = None
+
+    async def build():
+        sort_column = _sort_column(sort)
+        query = _apply_filters(meal_rows_query(), date, filters)
+        if user_filter is not None:
+            query = query.where(*user_filter.where())
+        descending = order == "desc"
+        if after:
+            # Keyset pagination: continue strictly after the last (sort value, id) seen
+            _, last_value, last_id = after
+            if descending:
+                query = query.filter(or_(sort_column < last_value, and_(sort_column == last_value, Meal.id < last_id)))
+            else:
+                query = query.filter(or_(sort_column > last_value, and_(sort_column == last_value, Meal.id > last_id)))
+        if descending:
+            query = query.order_by(sort_column.desc(), Meal.id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), Meal.id.asc())
+        # Fetch one extra row to know whether another page exists
+        rows = (await db.execute(query.add_columns(sort_column).limit(limit + 1))).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(sort, rows[-1][-1], rows[-1][0])
+        return dump_json({"meals": [meal_row_to_dict(row) for row in rows], "next_cursor": next_cursor})
+
+    try:
+        if for_user is not None:
+            user_filter = await get_user_filter(db, for_user)
+        # Keyed on the compiled filter, not just for_user, so a preferences change is never served stale
+        key = ("meals", tuple(sorted(request.query_params.multi_items())), user_filter.key if user_filter else None)
+        cache_control = PRIVATE_CACHE_CONTROL if user_filter is not None else MENU_CACHE_CONTROL
+        return await _cached_json(request, db, key, build, cache_control)
+    except HTTPException:
+        raise
+    except Exception:
+        # An empty 200 would look like a closed dining hall to clients, caches and the request metrics
+        logger.exception("Listing meals failed")
+        raise HTTPException(status_code=503, detail="Meal data is temporarily unavailable")
+
+@router.get("/meals/search", response_model=MealSearchResponse)
+async def search_meals(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    date: Optional[datetime.date] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Typo-tolerant, prefix-aware search over dish name, station and tags, best match first"""
+    async def build():
+        ranked = await search_meal_ids(db, q, date, limit)
+        rows = {}
+        if ranked:
+            query = meal_rows_query().where(Meal.id.in_([meal_id for meal_id, _ in ranked]))
+            rows = {row[0]: row for row in (await db.execute(query)).all()}
+        results = [
+            {**meal_row_to_dict(rows[meal_id]), "score": score}
+            for meal_id, score in ranked if meal_id in rows
+        ]
+        return dump_json({"query": q, "results": results})
+
+    key = ("search", q.strip().lower(), date, limit)
+    return await _cached_json(request, db, key, build)
+
+@router.get("/meals/{meal_id}", response_model=MealSchema)
+async def get_meal(meal_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def build():
+        row = (await db.execute(meal_rows_query(include_removed=True).where(Meal.id == meal_id))).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Meal not found")
+        return dump_json(meal_row_to_dict(row))
+
+    return await _cached_json(request, db, ("meal", meal_id), build)
+
+@router.get("/meals/{meal_id}/similar", response_model=SimilarMealsResponse)
+async def similar_meals(
+    meal_id: int,
+    request: Request,
+    date: Optional[datetime.date] = None,
+    k: int = Query(5, ge=1, le=50),
+    exclude_allergens: Optional[str] = None,
+    tag: List[str] = Query([]),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """The k meals on `date` (default today) closest to this one in nutrients and price.
+
+    Meals containing any of exclude_allergens (comma-separated), or missing
+    any requested tag, are skipped.
+    """
+    date = date or datetime.date.today()
+    excluded = [a.strip() for a in (exclude_allergens or "").split(",") if a.strip()]
+    unknown = [a for a in excluded if a not in ALLERGEN_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown allergens: {', '.join(unknown)}")
+
+    async def build():
+        row = (await db.execute(meal_rows_query(include_removed=True).where(Meal.id == meal_id))).first()
+        if not row:
+            raise HTTPException(status_code=404, detail="Meal not found")
+        vector = MenuMatrix([meal_row_to_dict(row)]).features[0]
+        menu = await db.run_sync(get_menu_matrix, date)
+        nearest = menu.nearest(vector, k, excluded, tag, exclude_ids=(meal_id,))
+        rows = {}
+        if nearest:
+            query = meal_rows_query().where(Meal.id.in_([i for i, _ in nearest]))
+            rows = {r[0]: r for r in (await db.execute(query)).all()}
+        results = [
+            {**meal_row_to_dict(rows[i]), "distance": round(distance, 4)}
+            for i, distance in nearest if i in rows
+        ]
+        return dump_json({"meal_id": meal_id, "date": date, "results": results})
+
+    key = ("similar", meal_id, date, k, tuple(excluded), tuple(tag))
+    return await _cached_json(request, db, key, build)
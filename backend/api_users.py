@@ -1,90 +1,336 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import datetime
+import hashlib
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from database import SessionLocal
-from models import User, UserPreferences, Favorite, IntakeTracking, Meal
-from schemas import UserPreferencesSchema, FavoriteSchema, IntakeTrackingSchema, MealSchema
+from api_meals import dump_json, meal_row_to_dict, meal_rows_query
+from database import get_async_db, insert_for
+from fields import NUTRIENT_FIELDS, as_date
+from intake_totals import TOTAL_FIELDS, apply_intake, apply_intakes, remove_intake
+from meal_planner import plan_meals
+from models import User, UserPreferences, Favorite, IntakeTracking, IntakeBatch, Meal, DailyIntakeTotal
+from pagination import encode_cursor, decode_cursor
+from recommendations import recommend
+from user_filters import get_user_filter, invalidate_user_filter
+from schemas import (
+    UserPreferencesSchema, FavoriteSchema, IntakeTrackingSchema, MealSchema, IntakeSummaryResponse, MealPlanResponse,
+    IntakeBatchRequest, IntakeBatchResponse, RecommendationsResponse,
+)
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # User Preferences
 @router.get("/users/{user_id}/preferences", response_model=UserPreferencesSchema)
-def get_preferences(user_id: int, db: Session = Depends(get_db)):
-    prefs = db.query(UserPreferences).filter(UserPreferences.user_id == user_id).first()
+async def get_preferences(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    prefs = await db.scalar(select(UserPreferences).where(UserPreferences.user_id == user_id))
     if not prefs:
         raise HTTPException(status_code=404, detail="Preferences not found")
     return prefs
 
 @router.post("/users/{user_id}/preferences", response_model=UserPreferencesSchema)
-def set_preferences(user_id: int, prefs: UserPreferencesSchema, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def set_preferences(user_id: int, prefs: UserPreferencesSchema, db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    existing = db.query(UserPreferences).filter(UserPreferences.user_id == user_id).first()
+    existing = await db.scalar(select(UserPreferences).where(UserPreferences.user_id == user_id))
     if existing:
         for k, v in prefs.dict(exclude_unset=True).items():
             setattr(existing, k, v)
     else:
         existing = UserPreferences(user_id=user_id, **prefs.dict())
         db.add(existing)
-    db.commit()
-    db.refresh(existing)
+    await db.commit()
+    invalidate_user_filter(user_id)
+    await db.refresh(existing)
     return existing
 
 # Favorites
 @router.get("/users/{user_id}/favorites", response_model=List[MealSchema])
-def get_favorites(user_id: int, db: Session = Depends(get_db)):
-    favs = db.query(Favorite).filter(Favorite.user_id == user_id).all()
-    meals = [db.query(Meal).filter(Meal.id == fav.meal_id).first() for fav in favs]
-    return meals
+async def get_favorites(
+    user_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # One flat query for the page of favorites, newest first, serialized
+    # straight from the rows like the /meals endpoints
+    favorited = func.coalesce(Favorite.date_favorited, datetime.date.min)
+    query = (
+        meal_rows_query(include_removed=True)
+        .join(Favorite, Favorite.meal_id == Meal.id)
+        .where(Favorite.user_id == user_id)
+        .add_columns(favorited, Favorite.id)
+    )
+    if cursor:
+        last_date, last_id = decode_cursor(cursor, 2)
+        try:
+            last_date = datetime.date.fromisoformat(last_date)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(or_(favorited < last_date, and_(favorited == last_date, Favorite.id < last_id)))
+    rows = (await db.execute(query.order_by(favorited.desc(), Favorite.id.desc()).limit(limit + 1))).all()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_date, last_id = rows[-1][-2:]
+        # The body stays a plain list of meals; the next page is advertised in a header
+        headers["X-Next-Cursor"] = encode_cursor(last_date, last_id)
+    return Response(content=dump_json([meal_row_to_dict(row) for row in rows]), media_type="application/json", headers=headers)
 
 @router.post("/users/{user_id}/favorites", response_model=FavoriteSchema)
-def add_favorite(user_id: int, fav: FavoriteSchema, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    meal = db.query(Meal).filter(Meal.id == fav.meal_id).first()
-    if not user or not meal:
+async def add_favorite(user_id: int, fav: FavoriteSchema, db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(User, user_id)
+    meal_id = await db.scalar(select(Meal.id).where(Meal.id == fav.meal_id))
+    if not user or meal_id is None:
         raise HTTPException(status_code=404, detail="User or meal not found")
-    existing = db.query(Favorite).filter(Favorite.user_id == user_id, Favorite.meal_id == fav.meal_id).first()
-    if existing:
-        return existing
-    new_fav = Favorite(user_id=user_id, meal_id=fav.meal_id, date_favorited=fav.date_favorited)
-    db.add(new_fav)
-    db.commit()
-    db.refresh(new_fav)
-    return new_fav
+    # The unique (user_id, meal_id) index makes a repeated favorite a no-op
+    insert = insert_for(db)
+    await db.execute(
+        insert(Favorite)
+        .values(user_id=user_id, meal_id=fav.meal_id, date_favorited=fav.date_favorited)
+        .on_conflict_do_nothing(index_elements=["user_id", "meal_id"])
+    )
+    await db.commit()
+    return await db.scalar(select(Favorite).where(Favorite.user_id == user_id, Favorite.meal_id == fav.meal_id))
 
 @router.delete("/users/{user_id}/favorites/{meal_id}")
-def remove_favorite(user_id: int, meal_id: int, db: Session = Depends(get_db)):
-    fav = db.query(Favorite).filter(Favorite.user_id == user_id, Favorite.meal_id == meal_id).first()
+async def remove_favorite(user_id: int, meal_id: int, db: AsyncSession = Depends(get_async_db)):
+    fav = await db.scalar(select(Favorite).where(Favorite.user_id == user_id, Favorite.meal_id == meal_id))
     if not fav:
         raise HTTPException(status_code=404, detail="Favorite not found")
-    db.delete(fav)
-    db.commit()
+    await db.delete(fav)
+    await db.commit()
     return {"detail": "Favorite removed"}
 
 # Intake Tracking
 @router.get("/users/{user_id}/intake", response_model=List[IntakeTrackingSchema])
-def get_intake(user_id: int, date: Optional[str] = None, db: Session = Depends(get_db)):
-    query = db.query(IntakeTracking).filter(IntakeTracking.user_id == user_id)
+async def get_intake(user_id: int, date: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    query = select(IntakeTracking).where(IntakeTracking.user_id == user_id)
     if date:
-        query = query.filter(IntakeTracking.date == date)
-    return query.all()
+        query = query.where(IntakeTracking.date == date)
+    return (await db.scalars(query)).all()
+
+def _period_start(column, granularity: str, dialect: str):
+    """SQL expression bucketing a date column into days or ISO (Monday) weeks"""
+    if granularity == "day":
+        return column
+    if dialect == "postgresql":
+        return func.date_trunc("week", column)
+    return func.date(column, "weekday 0", "-6 days")
+
+def _goal_progress(goals, totals: dict, days: int) -> list:
+    """Compare period totals against a UserFilter's daily (nutrient, is_min, target) goals scaled to the period length"""
+    progress = []
+    for nutrient, is_min, daily_target in goals:
+        target = daily_target * days
+        actual = totals[nutrient]
+        met = actual >= target if is_min else actual <= target
+        progress.append({"goal": f"{'min' if is_min else 'max'}_{nutrient}", "target": target, "actual": actual, "met": met})
+    return progress
+
+@router.get("/users/{user_id}/intake/summary", response_model=IntakeSummaryResponse)
+async def get_intake_summary(
+    user_id: int,
+    from_date: Optional[datetime.date] = Query(None, alias="from"),
+    to_date: Optional[datetime.date] = Query(None, alias="to"),
+    granularity: str = Query("day", pattern="^(day|week)$"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    to_date = to_date or datetime.date.today()
+    from_date = from_date or to_date - datetime.timedelta(days=29)
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+    # Reads the incrementally maintained daily rollup, so cost grows with the
+    # number of days in the range rather than the number of meals logged
+    period = _period_start(DailyIntakeTotal.date, granularity, db.get_bind().dialect.name).label("period")
+    rows = (await db.execute(
+        select(
+            period,
+            func.sum(DailyIntakeTotal.meals_logged).label("meals_logged"),
+            *[func.sum(getattr(DailyIntakeTotal, f)).label(f) for f in TOTAL_FIELDS],
+        )
+        .where(DailyIntakeTotal.user_id == user_id, DailyIntakeTotal.date.between(from_date, to_date))
+        .group_by(period)
+        .order_by(period)
+    )).all()
+    user_filter = await get_user_filter(db, user_id)
+    goals = user_filter.goals
+    budget_per_day = user_filter.budget_per_day
+
+    periods = []
+    for row in rows:
+        start = as_date(row.period)
+        end = start if granularity == "day" else start + datetime.timedelta(days=6)
+        # Weeks at the edges of the range only count the days inside it
+        days = (min(end, to_date) - max(start, from_date)).days + 1
+        totals = {f: float(getattr(row, f)) for f in NUTRIENT_FIELDS}
+        spent = float(row.spent)
+        budget = budget_per_day * days if budget_per_day is not None else None
+        periods.append({
+            "period_start": start,
+            "days": days,
+            "meals_logged": row.meals_logged,
+            **totals,
+            "spent": spent,
+            "budget": budget,
+            "within_budget": spent <= budget if budget is not None else None,
+            "goals": _goal_progress(goals, totals, days),
+        })
+    return {
+        "user_id": user_id,
+        "from_date": from_date,
+        "to_date": to_date,
+        "granularity": granularity,
+        "periods": periods,
+    }
 
 @router.post("/users/{user_id}/intake", response_model=IntakeTrackingSchema)
-def add_intake(user_id: int, intake: IntakeTrackingSchema, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    meal = db.query(Meal).filter(Meal.id == intake.meal_id).first()
-    if not user or not meal:
+async def add_intake(user_id: int, intake: IntakeTrackingSchema, db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(User, user_id)
+    meal_id = await db.scalar(select(Meal.id).where(Meal.id == intake.meal_id))
+    if not user or meal_id is None:
         raise HTTPException(status_code=404, detail="User or meal not found")
     new_intake = IntakeTracking(user_id=user_id, meal_id=intake.meal_id, date=intake.date)
     db.add(new_intake)
-    db.commit()
-    db.refresh(new_intake)
-    return new_intake 
\ No newline at end of file
+    # The rollup helpers are shared with the sync CLI, so run them on the session's sync facade
+    await db.run_sync(apply_intake, new_intake)
+    await db.commit()
+    return new_intake
+
+async def _stored_batch(db: AsyncSession, user_id: int, key: str, request_hash: str):
+    """The stored response for an idempotency key, or None if the key is new"""
+    batch = await db.scalar(select(IntakeBatch).where(IntakeBatch.user_id == user_id, IntakeBatch.idempotency_key == key))
+    if batch is None:
+        return None
+    if batch.request_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    return Response(content=dump_json(batch.response), media_type="application/json", headers={"Idempotent-Replayed": "true"})
+
+@router.post("/users/{user_id}/intake/batch", response_model=IntakeBatchResponse)
+async def add_intake_batch(
+    user_id: int,
+    batch: IntakeBatchRequest,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Log many meals at once with one IN query for validation and one bulk insert.
+
+    Entries whose meal doesn't exist are reported per item and skipped; the
+    rest are logged. With an Idempotency-Key header the response is stored and
+    a retry with the same key and body replays it instead of logging twice.
+    """
+    request_hash = hashlib.sha256(batch.model_dump_json().encode()).hexdigest()
+    if idempotency_key:
+        replay = await _stored_batch(db, user_id, idempotency_key, request_hash)
+        if replay is not None:
+            return replay
+    if await db.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    requested = {entry.meal_id for entry in batch.entries}
+    known = set((await db.scalars(select(Meal.id).where(Meal.id.in_(requested)))).all())
+    valid = [(i, entry) for i, entry in enumerate(batch.entries) if entry.meal_id in known]
+    created = {}
+    if valid:
+        insert = insert_for(db)
+        rows = [{"user_id": user_id, "meal_id": entry.meal_id, "date": entry.date} for _, entry in valid]
+        result = await db.execute(insert(IntakeTracking).returning(IntakeTracking.id, sort_by_parameter_order=True), rows)
+        created = dict(zip((i for i, _ in valid), result.scalars()))
+        await db.run_sync(apply_intakes, [(user_id, entry.date, entry.meal_id) for _, entry in valid])
+
+    results = []
+    for i, entry in enumerate(batch.entries):
+        item = {"index": i, "meal_id": entry.meal_id, "date": entry.date, "id": None, "error": None}
+        if i in created:
+            results.append({**item, "status": "created", "id": created[i]})
+        else:
+            results.append({**item, "status": "error", "error": "Meal not found"})
+    response = {"created": len(created), "failed": len(batch.entries) - len(created), "results": results}
+
+    if idempotency_key:
+        db.add(IntakeBatch(
+            user_id=user_id, idempotency_key=idempotency_key, request_hash=request_hash,
+            response=jsonable_encoder(response), created_at=datetime.datetime.utcnow(),
+        ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key committed first; its outcome stands
+        await db.rollback()
+        replay = await _stored_batch(db, user_id, idempotency_key, request_hash) if idempotency_key else None
+        if replay is None:
+            raise
+        return replay
+    return response
+
+@router.put("/users/{user_id}/intake/{intake_id}", response_model=IntakeTrackingSchema)
+async def update_intake(user_id: int, intake_id: int, intake: IntakeTrackingSchema, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(select(IntakeTracking).where(IntakeTracking.id == intake_id, IntakeTracking.user_id == user_id))
+    if not existing:
+        raise HTTPException(status_code=404, detail="Intake not found")
+    if await db.scalar(select(Meal.id).where(Meal.id == intake.meal_id)) is None:
+        raise HTTPException(status_code=404, detail="Meal not found")
+    await db.run_sync(remove_intake, existing)
+    existing.meal_id = intake.meal_id
+    existing.date = intake.date
+    await db.run_sync(apply_intake, existing)
+    await db.commit()
+    return existing
+
+@router.delete("/users/{user_id}/intake/{intake_id}")
+async def delete_intake(user_id: int, intake_id: int, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(select(IntakeTracking).where(IntakeTracking.id == intake_id, IntakeTracking.user_id == user_id))
+    if not existing:
+        raise HTTPException(status_code=404, detail="Intake not found")
+    await db.run_sync(remove_intake, existing)
+    await db.delete(existing)
+    await db.commit()
+    return {"detail": "Intake removed"}
+
+# Meal planning
+@router.get("/users/{user_id}/plan", response_model=MealPlanResponse)
+async def get_meal_plan(
+    user_id: int,
+    date: datetime.date,
+    slots: int = Query(3, ge=1, le=6),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if await db.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    user_filter = await get_user_filter(db, user_id)
+    meals = [meal_row_to_dict(row) for row in (await db.execute(meal_rows_query().where(Meal.date_available == date))).all()]
+    # The solver is CPU-bound for up to its time budget; keep it off the event loop
+    plan = await run_in_threadpool(plan_meals, meals, user_filter, slots=slots, time_budget=0.06)
+    totals = {f: sum((m["nutrients"] or {}).get(f) or 0.0 for m in plan["meals"]) for f in NUTRIENT_FIELDS}
+    return {
+        "user_id": user_id,
+        "date": date,
+        "meals": plan["meals"],
+        "feasible": plan["feasible"],
+        "optimal": plan["optimal"],
+        "total_price": sum(m["price"] or 0.0 for m in plan["meals"]),
+        "totals": totals,
+        "goals": _goal_progress(user_filter.goals, totals, 1) if plan["feasible"] else [],
+    }
+
+# Recommendations
+@router.get("/users/{user_id}/recommendations", response_model=RecommendationsResponse)
+async def get_recommendations(
+    user_id: int,
+    date: Optional[datetime.date] = None,
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Meals on `date` (default today) liked by people with similar favorites and intake"""
+    if await db.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    date = date or datetime.date.today()
+    ranked = await db.run_sync(recommend, user_id, date, limit)
+    results = [{**meal_row_to_dict(row), "score": score} for row, score in ranked]
+    return Response(content=dump_json({"user_id": user_id, "date": date, "results": results}), media_type="application/json")
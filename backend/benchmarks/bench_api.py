@@ -0,0 +1,229 @@
+"""API benchmark harness with stored baselines.
+
+Runs the real app under uvicorn against a database filled by seed_data.py
+and measures throughput and p50/p95/p99 latency for:
+
+  meals        GET /meals?date=...&limit=100
+  meal         GET /meals/{id}
+  favorites    GET /users/{id}/favorites
+  intake       GET /users/{id}/intake?date=...
+
+Request parameters are drawn from the seeded data with a fixed RNG seed,
+so two runs against the same database send exactly the same requests.
+Results can be saved as a named baseline (benchmarks/baselines/NAME.json)
+and later runs compared against it; a scenario whose throughput drops or
+whose p95 grows by more than --tolerance is reported as a regression and
+the command exits non-zero. Each scenario is measured --runs times and the
+median kept, which keeps run-to-run noise inside the tolerance. --markdown
+prints the comparison as a table ready to paste into a PR.
+
+    python seed_data.py --url sqlite:///./bench.db --users 2000 --days 120 --reset
+    python benchmarks/bench_api.py --url sqlite:///./bench.db --save sqlite-small
+    python benchmarks/bench_api.py --url sqlite:///./bench.db --compare sqlite-small --markdown
+"""
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import click
+import httpx
+from sqlalchemy import select
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINES_DIR = Path(__file__).resolve().parent / "baselines"
+sys.path.append(str(BACKEND_DIR))
+from database import make_engine
+from models import Favorite, IntakeTracking, Meal
+
+SCENARIOS = ("meals", "meal", "favorites", "intake")
+
+def request_paths(url, scenario, count, seed):
+    """The exact request paths for one scenario, drawn from the seeded data"""
+    rng = random.Random(f"{seed}:{scenario}")
+    engine = make_engine(url)
+    try:
+        with engine.connect() as conn:
+            if scenario in ("meals", "meal"):
+                dates = conn.scalars(select(Meal.date_available).distinct().order_by(Meal.date_available)).all()
+                ids = conn.scalars(select(Meal.id)).all()
+            if scenario == "favorites":
+                users = conn.scalars(select(Favorite.user_id).distinct()).all()
+            if scenario == "intake":
+                pairs = conn.execute(select(IntakeTracking.user_id, IntakeTracking.date).distinct().limit(50000)).all()
+    finally:
+        engine.dispose()
+    if scenario == "meals":
+        return [f"/meals?date={rng.choice(dates)}&limit=100" for _ in range(count)]
+    if scenario == "meal":
+        return [f"/meals/{rng.choice(ids)}" for _ in range(count)]
+    if scenario == "favorites":
+        return [f"/users/{rng.choice(users)}/favorites" for _ in range(count)]
+    return [f"/users/{user_id}/intake?date={day}" for user_id, day in (rng.choice(pairs) for _ in range(count))]
+
+async def run_paths(base_url, paths, concurrency):
+    latencies, errors = [], 0
+    queue = iter(paths)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def worker():
+            nonlocal errors
+            for path in queue:
+                t0 = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+    return elapsed, latencies, errors
+
+def summarize(elapsed, latencies, errors) -> dict:
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(1000 * cuts[49], 2),
+        "p95_ms": round(1000 * cuts[94], 2),
+        "p99_ms": round(1000 * cuts[98], 2),
+        "errors": errors,
+    }
+
+def start_server(url, port, no_cache):
+    env = {**os.environ, "DATABASE_URL": url}
+    if no_cache:
+        env["MENU_CACHE_SIZE"] = "0"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(base_url + "/", timeout=1.0)
+            return server, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.terminate()
+    raise click.ClickException("uvicorn did not come up")
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline, current, tolerance):
+    """Rows of (scenario, metric deltas, regressed?) against a stored baseline"""
+    rows = []
+    for scenario, now in current["results"].items():
+        before = baseline["results"].get(scenario)
+        if before is None:
+            rows.append((scenario, before, now, None, None, False))
+            continue
+        rps_change = now["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+        p95_change = now["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        regressed = rps_change < -tolerance or p95_change > tolerance or now["errors"] > before["errors"]
+        rows.append((scenario, before, now, rps_change, p95_change, regressed))
+    return rows
+
+def print_comparison(rows, name, markdown):
+    if markdown:
+        click.echo(f"| scenario | req/s ({name} -> now) | p95 ms ({name} -> now) | p99 ms now | |")
+        click.echo("|---|---|---|---|---|")
+    for scenario, before, now, rps_change, p95_change, regressed in rows:
+        if before is None:
+            cells = (scenario, f"new: {now['rps']}", f"new: {now['p95_ms']}", f"{now['p99_ms']}", "")
+        else:
+            cells = (
+                scenario,
+                f"{before['rps']} -> {now['rps']} ({rps_change:+.0%})",
+                f"{before['p95_ms']} -> {now['p95_ms']} ({p95_change:+.0%})",
+                f"{now['p99_ms']}",
+                "REGRESSION" if regressed else "ok",
+            )
+        if markdown:
+            click.echo("| " + " | ".join(cells) + " |")
+        else:
+            click.echo(f"{cells[0]:>10}  req/s {cells[1]:<28} p95 {cells[2]:<30} p99 {cells[3]:>8}  {cells[4]}")
+
+@click.command()
+@click.option("--url", default="sqlite:///./bench.db", help="Database seeded by seed_data.py")
+@click.option("--scenario", "scenarios", multiple=True, type=click.Choice(SCENARIOS), help="Default: all")
+@click.option("--requests", "count", default=2000, help="Requests per scenario")
+@click.option("--concurrency", default=32)
+@click.option("--runs", default=3, help="Measured runs per scenario; the median of each metric is reported")
+@click.option("--seed", default=1, help="RNG seed for request parameters")
+@click.option("--no-cache", is_flag=True, help="Disable the menu cache so every request reaches the database")
+@click.option("--port", default=8766)
+@click.option("--save", "save_name", help="Store the results as baselines/NAME.json")
+@click.option("--compare", "compare_name", help="Compare against baselines/NAME.json")
+@click.option("--tolerance", default=0.15, help="Allowed throughput drop / p95 growth before flagging")
+@click.option("--markdown", is_flag=True, help="Print the comparison as a Markdown table")
+def main(url, scenarios, count, concurrency, runs, seed, no_cache, port, save_name, compare_name, tolerance, markdown):
+    scenarios = scenarios or SCENARIOS
+    plans = {s: request_paths(url, s, count, seed) for s in scenarios}
+    server, base_url = start_server(url, port, no_cache)
+    results = {}
+    try:
+        for scenario, paths in plans.items():
+            asyncio.run(run_paths(base_url, paths[: max(count // 10, 1)], concurrency))  # warm-up
+            measured = [summarize(*asyncio.run(run_paths(base_url, paths, concurrency))) for _ in range(runs)]
+            results[scenario] = {k: statistics.median(m[k] for m in measured) for k in measured[0]}
+            r = results[scenario]
+            click.echo(f"{scenario:>10}: {r['rps']:8.1f} req/s  p50 {r['p50_ms']:7.2f}  p95 {r['p95_ms']:7.2f}  "
+                       f"p99 {r['p99_ms']:7.2f} ms  errors {r['errors']}")
+    finally:
+        server.terminate()
+        server.wait()
+
+    current = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "dialect": url.split(":", 1)[0],
+            "requests": count,
+            "concurrency": concurrency,
+            "runs": runs,
+            "seed": seed,
+            "cache": not no_cache,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if save_name:
+        BASELINES_DIR.mkdir(exist_ok=True)
+        path = BASELINES_DIR / f"{save_name}.json"
+        path.write_text(json.dumps(current, indent=2) + "\n")
+        click.echo(f"saved baseline {path}")
+    if compare_name:
+        path = BASELINES_DIR / f"{compare_name}.json"
+        if not path.is_file():
+            raise click.ClickException(f"No baseline {path}")
+        baseline = json.loads(path.read_text())
+        settings = ("requests", "concurrency", "runs", "seed", "cache")
+        if any(baseline["meta"].get(k) != current["meta"][k] for k in settings):
+            click.echo("warning: baseline was recorded with different --requests/--concurrency/--runs/--seed/--no-cache")
+        rows = compare(baseline, current, tolerance)
+        print_comparison(rows, compare_name, markdown)
+        if any(row[-1] for row in rows):
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Offline wall-time benchmark for the HTTP scraper.
+
+Serves the recorded station fixture for N synthetic stations with a fixed
+per-request latency, then scrapes the site at different concurrency levels.
+Sequential fetching (concurrency 1) approximates the old one-page-at-a-time
+browser session minus the browser overhead.
+
+    python benchmarks/bench_http_scraper.py --stations 40 --latency 0.25
+"""
+import asyncio
+import os
+import sys
+import time
+
+import click
+import httpx
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from http_scraper import FIXTURES_DIR, INDEX_PATH, parse_station, scrape_site
+
+def synthetic_transport(stations: int, latency: float):
+    station_html = (FIXTURES_DIR / "bistro-2-go.html").read_text()
+    links = "".join(
+        f'<a class="station-link" href="{INDEX_PATH}/station-{i}?date=2024-01-15">Station {i}</a>'
+        for i in range(stations)
+    )
+    index_html = f'<nav class="menu-stations" data-date="2024-01-15">{links}</nav>'
+
+    async def handler(request: httpx.Request):
+        await asyncio.sleep(latency)
+        body = index_html if request.url.path == INDEX_PATH else station_html
+        return httpx.Response(200, text=body, headers={"content-type": "text/html"})
+
+    return httpx.MockTransport(handler)
+
+@click.command()
+@click.option("--stations", default=40)
+@click.option("--latency", default=0.25, help="Simulated seconds per request")
+def main(stations, latency):
+    html = (FIXTURES_DIR / "bistro-2-go.html").read_text()
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        parse_station(html)
+    click.echo(f"parse_station: {(time.perf_counter() - t0):.3f} ms per page")
+
+    for concurrency in (1, 4, 8, 16):
+        transport = synthetic_transport(stations, latency)
+        t0 = time.perf_counter()
+        result = asyncio.run(scrape_site("https://dining.test", transport=transport,
+                                         concurrency=concurrency, min_interval=0.0))
+        elapsed = time.perf_counter() - t0
+        click.echo(f"concurrency {concurrency:2d}: {elapsed:6.2f}s for {result['pages']} pages, {len(result['items'])} items")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Before/after benchmark for the intake_tracking (user_id, date) index.
+
+Seeds a throwaway database with a large intake table, then times the lookups
+issued by GET /users/{id}/intake with and without the index and prints the
+query plan for each.
+
+    python benchmarks/bench_intake_index.py --rows 1000000
+    python benchmarks/bench_intake_index.py --url postgresql://localhost/bench
+"""
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+import click
+from sqlalchemy import create_engine, text
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from models import Base
+
+QUERIES = {
+    "user_and_date": "SELECT meal_id, date FROM intake_tracking WHERE user_id = :user_id AND date = :date",
+    "user_history": "SELECT meal_id, date FROM intake_tracking WHERE user_id = :user_id",
+}
+
+def seed(engine, rows, users, meals, days):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    # Start from the pre-migration layout so the "before" numbers are honest
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS ix_intake_tracking_user_date"))
+        conn.execute(
+            text("INSERT INTO users (id, email, password_hash) VALUES (:id, :email, 'x')"),
+            [{"id": i, "email": f"bench{i}@example.com"} for i in range(1, users + 1)],
+        )
+        conn.execute(
+            text("INSERT INTO meals (id, name) VALUES (:id, :name)"),
+            [{"id": i, "name": f"Bench meal {i}"} for i in range(1, meals + 1)],
+        )
+    start = datetime.date(2024, 9, 1)
+    rng = random.Random(42)
+    batch = []
+    with engine.begin() as conn:
+        for _ in range(rows):
+            batch.append({
+                "user_id": rng.randint(1, users),
+                "meal_id": rng.randint(1, meals),
+                "date": start + datetime.timedelta(days=rng.randrange(days)),
+            })
+            if len(batch) == 50000:
+                conn.execute(text("INSERT INTO intake_tracking (user_id, meal_id, date) VALUES (:user_id, :meal_id, :date)"), batch)
+                batch = []
+        if batch:
+            conn.execute(text("INSERT INTO intake_tracking (user_id, meal_id, date) VALUES (:user_id, :meal_id, :date)"), batch)
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE intake_tracking"))
+    return start
+
+def explain(conn, sql, params):
+    if conn.dialect.name == "postgresql":
+        rows = conn.execute(text("EXPLAIN ANALYZE " + sql), params).fetchall()
+        return "\n".join(r[0] for r in rows)
+    rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).fetchall()
+    return "\n".join(str(r[-1]) for r in rows)
+
+def time_queries(engine, start, users, days, samples):
+    rng = random.Random(7)
+    results = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            params = [{
+                "user_id": rng.randint(1, users),
+                "date": start + datetime.timedelta(days=rng.randrange(days)),
+            } for _ in range(samples)]
+            timings = []
+            for p in params:
+                t0 = time.perf_counter()
+                conn.execute(text(sql), p).fetchall()
+                timings.append((time.perf_counter() - t0) * 1000)
+            timings.sort()
+            results[name] = {
+                "plan": explain(conn, sql, params[0]),
+                "p50_ms": statistics.median(timings),
+                "p95_ms": timings[int(len(timings) * 0.95) - 1],
+            }
+    return results
+
+def report(label, results):
+    click.echo(f"== {label} ==")
+    for name, r in results.items():
+        click.echo(f"{name}: p50={r['p50_ms']:.3f}ms p95={r['p95_ms']:.3f}ms")
+        click.echo("  " + r["plan"].replace("\n", "\n  "))
+
+@click.command()
+@click.option("--url", default="sqlite:///./bench_intake.db", help="Database to seed (it is wiped)")
+@click.option("--rows", default=1_000_000, help="Number of intake rows to generate")
+@click.option("--users", default=20_000)
+@click.option("--meals", default=5_000)
+@click.option("--days", default=365)
+@click.option("--samples", default=200, help="Timed lookups per query")
+def main(url, rows, users, meals, days, samples):
+    engine = create_engine(url)
+    click.echo(f"Seeding {rows} intake rows into {engine.dialect.name}...")
+    start = seed(engine, rows, users, meals, days)
+    report("before (no index)", time_queries(engine, start, users, days, samples))
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX ix_intake_tracking_user_date ON intake_tracking (user_id, date)"))
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE intake_tracking"))
+    report("after (ix_intake_tracking_user_date)", time_queries(engine, start, users, days, samples))
+
+if __name__ == "__main__":
+    main()
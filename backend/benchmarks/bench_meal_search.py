@@ -0,0 +1,80 @@
+"""Fuzzy meal search over a year of menus: in-memory trigram index vs a LIKE scan.
+
+Menus come from seed_data's dish catalog, so dishes recur across days the
+way they do on the real site. The index path is what /meals/search uses on
+SQLite; the scan path is the `name LIKE '%q%'` a plain search would run,
+which is also blind to typos (its hit count is printed alongside).
+
+    python benchmarks/bench_meal_search.py --days 365 --meals-per-day 60
+"""
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+import click
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from meal_search import SearchIndex
+from seed_data import make_catalog
+
+# Exact, prefix and misspelled queries a student would type
+QUERIES = ["burger", "smash burg", "burgr", "shawarma", "shawrma", "pad thai", "padthai", "poke",
+           "chiken", "butter chick", "mac and chese", "falafel", "vegan", "halal", "tofu", "pho", "taco"]
+
+def make_rows(days, meals_per_day, catalog, rng):
+    dishes = make_catalog(rng, catalog)
+    start = datetime.date.today() - datetime.timedelta(days=days - 1)
+    rows, meal_id = [], 0
+    for offset in range(days):
+        day = start + datetime.timedelta(days=offset)
+        for dish in rng.sample(dishes, min(meals_per_day, len(dishes))):
+            meal_id += 1
+            rows.append((meal_id, dish["name"], dish["station"], dish["tags"], day))
+    return rows
+
+def like_scan(rows, q):
+    q = q.lower()
+    return [row[0] for row in rows if q in row[1].lower()]
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(1000 * (time.perf_counter() - t0))
+    return samples
+
+@click.command()
+@click.option("--days", default=365)
+@click.option("--meals-per-day", default=60)
+@click.option("--catalog", default=400)
+@click.option("--repeat", default=50, help="Timed runs per query")
+@click.option("--seed", default=42)
+def main(days, meals_per_day, catalog, repeat, seed):
+    rows = make_rows(days, meals_per_day, catalog, random.Random(seed))
+    t0 = time.perf_counter()
+    index = SearchIndex(rows)
+    click.echo(f"{len(rows)} meals, {len(index)} distinct dishes, index built in {time.perf_counter() - t0:.3f}s")
+
+    index_ms, scan_ms = [], []
+    click.echo(f"{'query':>14}  {'hits':>4}  {'top match':<32} {'index p50':>9}  {'scan p50':>8}  {'LIKE hits':>9}")
+    for q in QUERIES:
+        results = index.search(q)
+        by_id = {row[0]: row[1] for row in rows}
+        top = by_id[results[0][0]] if results else "-"
+        index_samples = timed(lambda: index.search(q), repeat)
+        scan_samples = timed(lambda: like_scan(rows, q), max(repeat // 10, 1))
+        index_ms += index_samples
+        scan_ms += scan_samples
+        click.echo(f"{q:>14}  {len(results):>4}  {top:<32} {statistics.median(index_samples):8.3f}ms "
+                   f"{statistics.median(scan_samples):7.2f}ms  {len(like_scan(rows, q)):>9}")
+
+    for label, samples in (("index", index_ms), ("LIKE scan", scan_ms)):
+        cuts = statistics.quantiles(samples, n=100, method="inclusive")
+        click.echo(f"{label:>10}: p50 {cuts[49]:.3f}ms  p95 {cuts[94]:.3f}ms  p99 {cuts[98]:.3f}ms")
+
+if __name__ == "__main__":
+    main()
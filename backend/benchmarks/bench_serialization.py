@@ -0,0 +1,98 @@
+"""Serialization cost of the meal list, before and after the orjson row path.
+
+before: ORM Meal objects (selectinload) -> meal_to_dict() -> MealListResponse
+        validation -> model_dump_json()
+after:  meal_rows_query() tuples -> meal_row_to_dict() -> orjson
+
+Both paths run over the same in-memory menu. The "after" JSON is first
+checked against the "before" JSON and against MealListResponse, so the
+response_model contract is verified on every run.
+
+    python benchmarks/bench_serialization.py --meals 1000 --repeat 20
+"""
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+import click
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+from api_meals import dump_json, meal_query, meal_row_to_dict, meal_rows_query, meal_to_dict
+from models import Allergen, Base, Meal, Nutrient
+from schemas import MealListResponse
+
+def seed(session, meals):
+    rng = random.Random(7)
+    day = datetime.date(2024, 1, 15)
+    for i in range(meals):
+        meal = Meal(
+            name=f"Meal {i}", station=f"Station {i % 12}", serving_time="Lunch", date_available=day,
+            # Whole-number prices come back from SQLite as int, which must still serialize as floats
+            price=rng.choice([None, 6, round(rng.uniform(4, 15), 2)]),
+            tags="Vegan" if i % 11 == 0 else rng.sample(["Vegan", "Halal", "Gluten Free", "Spicy"], rng.randint(0, 2)),
+        )
+        if i % 9:
+            meal.nutrients = [Nutrient(calories=rng.uniform(100, 900), protein=rng.randint(0, 60), carbs=rng.uniform(0, 90),
+                                       fat=None if i % 7 == 0 else rng.uniform(0, 40), sodium=rng.uniform(0, 2000),
+                                       sugar=rng.uniform(0, 30), fiber=rng.uniform(0, 12))]
+        if i % 5:
+            meal.allergens = [Allergen(peanuts=i % 2 == 0, gluten=i % 3 == 0, dairy=None, soy=False, egg=False,
+                                       fish=False, shellfish=False, tree_nuts=False, sesame=False)]
+        session.add(meal)
+    session.commit()
+
+def before(session):
+    meals = session.scalars(meal_query().order_by(Meal.id)).all()
+    payload = {"meals": [meal_to_dict(m) for m in meals], "next_cursor": None}
+    return MealListResponse.model_validate(payload).model_dump_json().encode()
+
+def after(session):
+    rows = session.execute(meal_rows_query().order_by(Meal.id)).all()
+    return dump_json({"meals": [meal_row_to_dict(row) for row in rows], "next_cursor": None})
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+@click.command()
+@click.option("--meals", default=1000)
+@click.option("--repeat", default=20)
+def main(meals, repeat):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        seed(session, meals)
+        old, new = before(session), after(session)
+        assert json.loads(new) == json.loads(old), "orjson path differs from the MealListResponse output"
+        assert MealListResponse.model_validate_json(new).model_dump_json().encode() == old
+        click.echo(f"contract: identical JSON ({'byte-for-byte' if new == old else 'semantically'}), {len(new)} bytes")
+
+        # Serialization only: the rows/objects are fetched once up front
+        objects = session.scalars(meal_query().order_by(Meal.id)).all()
+        rows = session.execute(meal_rows_query().order_by(Meal.id)).all()
+        serialize_old = timed(lambda: MealListResponse.model_validate(
+            {"meals": [meal_to_dict(m) for m in objects], "next_cursor": None}).model_dump_json().encode(), repeat)
+        serialize_new = timed(lambda: dump_json(
+            {"meals": [meal_row_to_dict(row) for row in rows], "next_cursor": None}), repeat)
+        per = 1000 / meals
+        click.echo(f"serialize  before {1000 * serialize_old * per:7.2f} ms / 1,000 meals")
+        click.echo(f"serialize  after  {1000 * serialize_new * per:7.2f} ms / 1,000 meals  ({serialize_old / serialize_new:.1f}x)")
+
+        # Query + serialization, as the endpoint does it on a cache miss
+        session.expunge_all()
+        total_old = timed(lambda: (session.expunge_all(), before(session)), repeat)
+        total_new = timed(lambda: after(session), repeat)
+        click.echo(f"end-to-end before {1000 * total_old * per:7.2f} ms / 1,000 meals")
+        click.echo(f"end-to-end after  {1000 * total_new * per:7.2f} ms / 1,000 meals  ({total_old / total_new:.1f}x)")
+
+if __name__ == "__main__":
+    main()
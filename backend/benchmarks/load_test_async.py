@@ -0,0 +1,163 @@
+"""Requests/sec load test of the async routers against the old sync handlers.
+
+Seeds a throwaway database with users, meals and favorites, then serves
+GET /users/{id}/favorites (an uncached join + two selectin loads) two ways
+under uvicorn and hammers each with the same number of concurrent clients:
+
+  * sync  -- the pre-port handler: plain `def`, blocking SessionLocal, run in
+             Starlette's threadpool (40 threads by default)
+  * async -- the real app from main.py: `async def` on AsyncSession
+
+    python benchmarks/load_test_async.py --clients 500 --requests 20000
+    python benchmarks/load_test_async.py --url postgresql://localhost/bench
+"""
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import click
+import httpx
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
+
+def sync_app():
+    """The favorites endpoint exactly as it was before the async port"""
+    from fastapi import Depends, FastAPI
+    from sqlalchemy.orm import Session, selectinload
+    from api_meals import meal_to_dict
+    from database import get_db
+    from models import Favorite, Meal
+
+    app = FastAPI()
+
+    @app.get("/users/{user_id}/favorites")
+    def get_favorites(user_id: int, db: Session = Depends(get_db)):
+        rows = (
+            db.query(Meal)
+            .options(selectinload(Meal.nutrients), selectinload(Meal.allergens))
+            .join(Favorite, Favorite.meal_id == Meal.id)
+            .filter(Favorite.user_id == user_id)
+            .order_by(Favorite.id.desc())
+            .limit(51)
+            .all()
+        )
+        return [meal_to_dict(meal) for meal in rows]
+
+    return app
+
+def seed(users, meals, favorites_per_user):
+    from database import SessionLocal, engine
+    from models import Allergen, Base, Favorite, Meal, Nutrient, User
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    rng = random.Random(42)
+    day = datetime.date(2024, 1, 15)
+    db = SessionLocal()
+    try:
+        db.add_all(User(id=i, email=f"load{i}@example.com", password_hash="x") for i in range(1, users + 1))
+        for i in range(1, meals + 1):
+            meal = Meal(id=i, name=f"Load meal {i}", station="Bench", serving_time="Lunch",
+                        date_available=day, price=rng.uniform(4, 14), tags=["Vegan"] if i % 4 == 0 else [])
+            meal.nutrients = [Nutrient(calories=rng.uniform(200, 900), protein=rng.uniform(5, 50), carbs=40,
+                                       fat=15, sodium=rng.uniform(100, 1500), sugar=5, fiber=3)]
+            meal.allergens = [Allergen(gluten=i % 2 == 0, dairy=i % 3 == 0)]
+            db.add(meal)
+        db.flush()
+        for user_id in range(1, users + 1):
+            for meal_id in rng.sample(range(1, meals + 1), favorites_per_user):
+                db.add(Favorite(user_id=user_id, meal_id=meal_id, date_favorited=day))
+        db.commit()
+    finally:
+        db.close()
+
+async def hammer(base_url, users, clients, total):
+    latencies, errors = [], 0
+    remaining = total
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def worker(seed):
+            nonlocal remaining, errors
+            rng = random.Random(seed)
+            while remaining > 0:
+                remaining -= 1
+                t0 = time.perf_counter()
+                try:
+                    response = await client.get(f"/users/{rng.randint(1, users)}/favorites")
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+        elapsed = time.perf_counter() - t0
+    return elapsed, latencies, errors
+
+def wait_until_up(base_url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(base_url + "/docs", timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not come up")
+
+@click.group()
+def cli():
+    pass
+
+@cli.command()
+@click.argument("mode", type=click.Choice(["sync", "async"]))
+@click.option("--port", default=8765)
+def serve(mode, port):
+    """Run one side of the comparison under uvicorn (used by `run`)"""
+    import uvicorn
+    if mode == "sync":
+        # Before the port the sync engine had the whole connection budget; it now only gets a small fixed pool
+        os.environ.setdefault("DB_SYNC_POOL_SIZE", os.getenv("DB_MAX_CONNECTIONS", "20"))
+        app = sync_app()
+    else:
+        from main import app
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+@cli.command()
+@click.option("--url", default="sqlite:///./loadtest.db", help="Database to seed and serve from")
+@click.option("--clients", default=500, help="Concurrent clients")
+@click.option("--requests", "total", default=20000, help="Requests per run")
+@click.option("--users", default=200)
+@click.option("--meals", default=500)
+@click.option("--favorites", default=25, help="Favorites per user")
+@click.option("--port", default=8765)
+def run(url, clients, total, users, meals, favorites, port):
+    os.environ["DATABASE_URL"] = url
+    seed(users, meals, favorites)
+    base_url = f"http://127.0.0.1:{port}"
+    click.echo(f"{clients} clients, {total} requests per run, GET /users/{{id}}/favorites")
+    for mode in ("sync", "async"):
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", mode, "--port", str(port)],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)) + '/../', env=os.environ.copy())
+        try:
+            wait_until_up(base_url)
+            asyncio.run(hammer(base_url, users, min(clients, 50), min(total, 500)))  # warm the pools
+            elapsed, latencies, errors = asyncio.run(hammer(base_url, users, clients, total))
+        finally:
+            server.terminate()
+            server.wait()
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        click.echo(
+            f"{mode:>5}: {total / elapsed:8.1f} req/s  p50 {1000 * statistics.median(latencies):7.1f} ms  "
+            f"p95 {1000 * p95:7.1f} ms  errors {errors}"
+        )
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,15 @@
+import pytest
+from query_inspector import attach_query_log, query_budget as _query_budget
+
+@pytest.fixture
+def query_budget():
+    """Statement budget for an endpoint call:
+
+        def test_list_meals(client, query_budget):
+            with query_budget(1, max_repeats=1):
+                client.get("/meals")
+    """
+    from database import async_engine, engine
+    attach_query_log(engine)
+    attach_query_log(async_engine.sync_engine)
+    return _query_budget
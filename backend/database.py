@@ -1,6 +1,12 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 from dotenv import load_dotenv
 
 load_dotenv("supabase.env")
@@ -12,12 +18,232 @@ if not DATABASE_URL:
     DATABASE_URL = "sqlite:///./mcmaster_meals.db"
     print("Using local SQLite database as fallback")
 
-engine = create_engine(DATABASE_URL)
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+# Pool sizing. DB_MAX_CONNECTIONS is the connection budget for the whole
+# deployment (Supabase's pooler caps it); each uvicorn worker gets its share.
+# The sync engine only serves the scrape worker thread (its session plus a
+# progress heartbeat) and admin job lookups, so it gets a small fixed pool out
+# of that share; the async engine, which every router uses, gets the rest.
+WEB_CONCURRENCY = max(_env_int("WEB_CONCURRENCY", 1), 1)
+DB_MAX_CONNECTIONS = _env_int("DB_MAX_CONNECTIONS", 20)
+DB_SYNC_POOL_SIZE = _env_int("DB_SYNC_POOL_SIZE", 3)
+_ASYNC_SHARE = max(DB_MAX_CONNECTIONS // WEB_CONCURRENCY - DB_SYNC_POOL_SIZE, 1)
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", max(_ASYNC_SHARE // 2, 1))
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", max(_ASYNC_SHARE - DB_POOL_SIZE, 0))
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 10)
+# Recycle below Supabase's idle timeout so we never check out a connection it already dropped
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 15000)
+SQLITE_BUSY_TIMEOUT_MS = _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+
+class PoolStats:
+    """Checkout counters and wait times for one engine's connection pool"""
+
+    def __init__(self, max_overflow=None):
+        self._lock = threading.Lock()
+        self.max_overflow = max_overflow  # as configured; QueuePool has no public accessor
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": 1000 * self.wait_total / self.waits if self.waits else 0.0,
+                "wait_max_ms": 1000 * self.wait_max,
+            }
+        stats["pool"] = type(pool).__name__
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=self.max_overflow,
+            )
+        return stats
+
+class _TimedCheckout:
+    """Pool mixin reporting how long each checkout waited for a free connection"""
+
+    stats = None  # set by the engine factory; carried over when the pool is recreated
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats:
+                self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.stats:
+            self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+def _is_memory_sqlite(url: str) -> bool:
+    """True for in-memory SQLite under any driver (sqlite://, sqlite+aiosqlite:///:memory:, ?mode=memory)"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return False
+    return parsed.database in (None, "", ":memory:") or parsed.query.get("mode") == "memory"
+
+def _engine_kwargs(url: str, is_async: bool) -> dict:
+    kwargs = {}
+    if url.startswith("sqlite"):
+        kwargs["connect_args"] = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    else:
+        if url.startswith("postgres") and DB_STATEMENT_TIMEOUT_MS:
+            if is_async:
+                kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+            else:
+                kwargs["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+        kwargs["pool_recycle"] = DB_POOL_RECYCLE
+    if _is_memory_sqlite(url):
+        # Every new connection would open its own empty database, so share exactly one.
+        # The sync and async engines still each get their own database.
+        kwargs["poolclass"] = StaticPool
+    else:
+        kwargs.update(
+            poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+            pool_size=DB_POOL_SIZE if is_async else DB_SYNC_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW if is_async else 0,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+    return kwargs
+
+def _instrument(sync_engine, url: str, max_overflow=None):
+    """Attach pool statistics and, for SQLite, the connection pragmas"""
+    stats = PoolStats(max_overflow)
+    sync_engine.pool_stats = stats
+    if isinstance(sync_engine.pool, _TimedCheckout):
+        sync_engine.pool.stats = stats
+
+    if sync_engine.dialect.name == "sqlite":
+        wal = not _is_memory_sqlite(url)
+
+        @event.listens_for(sync_engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            if wal:
+                cursor.execute("PRAGMA journal_mode=WAL")
+                # With WAL, NORMAL only risks the last transactions on power loss, never corruption
+                cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            cursor.execute("PRAGMA cache_size=-16000")
+            cursor.close()
+
+    for name, counter in (("checkout", "checkouts"), ("checkin", "checkins"),
+                          ("connect", "connects"), ("invalidate", "invalidations")):
+        event.listen(sync_engine, name, lambda *args, counter=counter: stats.count(counter))
+
+def make_engine(url: str = DATABASE_URL, **overrides):
+    """Engine with pool settings from the environment and per-dialect tuning.
+
+    PostgreSQL gets a server-side statement_timeout; file-backed SQLite gets
+    WAL journaling and a busy timeout so the scrape worker and request threads
+    can write without "database is locked" errors.
+    """
+    kwargs = {**_engine_kwargs(url, False), **overrides}
+    new_engine = create_engine(url, **kwargs)
+    _instrument(new_engine, url, kwargs.get("max_overflow"))
+    return new_engine
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    """Same database through an asyncio driver: asyncpg for Postgres, aiosqlite for SQLite"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    if backend in ("postgresql", "postgres"):
+        # asyncpg takes ssl instead of libpq's sslmode
+        query = dict(parsed.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return parsed.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+    return url
+
+def make_async_engine(url: str = DATABASE_URL, **overrides):
+    """Async counterpart of make_engine(), with the same pool settings and tuning"""
+    async_url = async_database_url(url)
+    kwargs = {**_engine_kwargs(async_url, True), **overrides}
+    new_engine = create_async_engine(async_url, **kwargs)
+    _instrument(new_engine.sync_engine, async_url, kwargs.get("max_overflow"))
+    return new_engine
+
+# The sync engine serves the scrape worker thread and admin job lookups on a
+# DB_SYNC_POOL_SIZE pool; the routers all go through the async engine
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = make_async_engine(DATABASE_URL)
+# expire_on_commit=False: committed rows are serialized after the commit without another round-trip
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 def get_db():
+    """Session for sync code paths (scripts, background jobs)"""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Request-scoped AsyncSession; the one dependency every router uses"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def pool_stats() -> dict:
+    return {
+        "sync": engine.pool_stats.snapshot(engine.pool),
+        "async": async_engine.sync_engine.pool_stats.snapshot(async_engine.sync_engine.pool),
+    }
+
+def insert_for(db):
+    """Return the dialect-specific insert() so callers can use ON CONFLICT clauses"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
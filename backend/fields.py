@@ -0,0 +1,25 @@
+"""Nutrient and allergen column names, plus the name and date normalization
+shared by the routers, scrapers, menu matrices and preference filters.
+
+Kept out of the router modules so anything can import them without cycles.
+"""
+import datetime
+
+NUTRIENT_FIELDS = ("calories", "protein", "carbs", "fat", "sodium", "sugar", "fiber")
+ALLERGEN_FIELDS = ("peanuts", "gluten", "dairy", "soy", "egg", "fish", "shellfish", "tree_nuts", "sesame")
+
+def normalize_name(value: str) -> str:
+    """Comparable form of an allergen or tag name: "Tree Nuts" / "tree-nuts" -> "tree_nuts" """
+    return value.strip().lower().replace(" ", "_").replace("-", "_")
+
+def as_date(value) -> datetime.date:
+    """date from a date, datetime or ISO string"""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+def escape_like(value: str) -> str:
+    """value with %, _ and backslash escaped, for LIKE patterns whose escape character is a backslash"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
@@ -0,0 +1,299 @@
+"""HTTP-first scraper for the McMaster dining menus.
+
+Station pages are fetched concurrently through one pooled async httpx client
+and parsed with selectolax. Only pages whose menu is rendered client-side
+(no menu items in the HTML, but a JS app shell) are handed to a headless
+Selenium browser, and their rendered HTML goes through the same parser.
+
+Requests are bounded by a semaphore and spaced per host, and transient
+failures (connection errors, 429, 5xx) are retried with exponential backoff,
+honouring Retry-After. Scrape jobs keep per-page checkpoints
+(scrape_checkpoints.py) to send conditional GETs, skip unchanged pages and
+resume interrupted runs.
+
+A run that finds no station pages, or parses no menu items, fails with
+ScrapeError instead of ingesting: a maintenance page or a markup change must
+not read as "today's menu is empty". Only the dates of parsed items are
+handed to ingest_menu as complete.
+
+scraper_fixtures/ holds sample pages in the markup this parser expects;
+fixture_transport() serves them so the whole pipeline runs offline. The
+selectors have not yet been checked against recorded pages from the live
+site, which is why api_admin still defaults to the Selenium scraper.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import re
+import time
+from pathlib import Path
+from urllib.parse import urljoin, urlparse
+
+import httpx
+from selectolax.lexbor import LexborHTMLParser as HTMLParser
+
+from fields import ALLERGEN_FIELDS, NUTRIENT_FIELDS
+from menu_ingest import ingest_menu
+from scrape_checkpoints import CheckpointStore
+
+logger = logging.getLogger(__name__)
+
+DINING_BASE_URL = os.getenv("DINING_BASE_URL", "https://hospitality.mcmaster.ca")
+INDEX_PATH = "/menus"
+FIXTURES_DIR = Path(__file__).parent / "scraper_fixtures"
+USER_AGENT = "MacMealMatch-scraper/1.0 (+https://github.com/SimardeepDhanda/MealMap---University-Diet-Tracker)"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+_number = re.compile(r"-?\d+(?:\.\d+)?")
+
+class ScrapeError(Exception):
+    """The site answered, but not with a menu this scraper can read"""
+
+class HostRateLimiter:
+    """Keep at least min_interval seconds between request starts to the same host"""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str):
+        host = urlparse(url).netloc
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+async def fetch(client, url, limiter, retries=3, backoff=0.5, headers=None):
+    """GET url with per-host spacing and retry/backoff; returns the final response"""
+    for attempt in range(retries + 1):
+        await limiter.wait(url)
+        try:
+            response = await client.get(url, headers=headers)
+        except httpx.TransportError as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"Fetching {url} failed ({e!r}), retrying")
+            delay = backoff * 2 ** attempt
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+            retry_after = response.headers.get("retry-after", "")
+            delay = float(retry_after) if retry_after.isdigit() else backoff * 2 ** attempt
+            logger.warning(f"Fetching {url} returned {response.status_code}, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay * (1 + random.random() * 0.1))
+
+def _to_float(text):
+    match = _number.search((text or "").replace(",", ""))
+    return float(match.group()) if match else None
+
+def parse_index(html: str, base_url: str):
+    """Return (menu date, [{"url", "station"}]) from the menus landing page.
+
+    The date is None when the page carries no station list (e.g. a maintenance page).
+    """
+    tree = HTMLParser(html)
+    nav = tree.css_first(".menu-stations")
+    date = nav.attributes.get("data-date") if nav else None
+    pages = [
+        {"url": urljoin(base_url, a.attributes["href"]), "station": a.text(strip=True)}
+        for a in tree.css("a.station-link") if a.attributes.get("href")
+    ]
+    return date, pages
+
+def parse_station(html: str, default_date: str = None):
+    """Return (items, needs_js) for one station page.
+
+    needs_js is True when the page carries no menu items but looks like a
+    client-rendered shell, i.e. plain HTTP cannot see its menu.
+    """
+    tree = HTMLParser(html)
+    section = tree.css_first("section.station")
+    station = section.attributes.get("data-station") if section else None
+    date = (section.attributes.get("data-date") if section else None) or default_date
+    items = []
+    for node in tree.css("article.menu-item"):
+        name_node = node.css_first(".item-name")
+        if name_node is None:
+            continue
+        nutrients = {f: None for f in NUTRIENT_FIELDS}
+        for dd in node.css("[data-nutrient]"):
+            field = dd.attributes.get("data-nutrient")
+            if field in nutrients:
+                nutrients[field] = _to_float(dd.text())
+        allergens = {f: False for f in ALLERGEN_FIELDS}
+        for li in node.css("[data-allergen]"):
+            field = li.attributes.get("data-allergen")
+            if field in allergens:
+                allergens[field] = True
+        price_node = node.css_first(".item-price")
+        items.append({
+            "name": name_node.text(strip=True),
+            "station": station,
+            "serving_time": node.attributes.get("data-serving-time"),
+            "date_available": date,
+            "price": _to_float(price_node.text()) if price_node else None,
+            "tags": [li.text(strip=True) for li in node.css(".item-tags li")],
+            "nutrients": nutrients,
+            "allergens": allergens,
+        })
+    needs_js = not items and (
+        tree.css_first("[data-client-rendered]") is not None or tree.css_first("noscript") is not None
+    )
+    return items, needs_js
+
+async def scrape_site(base_url=DINING_BASE_URL, transport=None, concurrency=8, min_interval=0.1,
+                      retries=3, backoff=0.5, job=None, checkpoints=None) -> dict:
+    """Fetch and parse every station page; returns items, pages needing JS, and the menu date.
+
+    With a CheckpointStore, pages finished by an interrupted run are skipped,
+    others are fetched conditionally, and unchanged pages reuse their stored items.
+    """
+    limiter = HostRateLimiter(min_interval)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    outcomes = {"fetched": 0, "unchanged": 0, "not_modified": 0, "resumed": 0}
+    async with httpx.AsyncClient(
+        transport=transport, limits=limits, timeout=20.0, follow_redirects=True,
+        headers={"User-Agent": USER_AGENT},
+    ) as client:
+        index = await fetch(client, urljoin(base_url, INDEX_PATH), limiter, retries, backoff)
+        index.raise_for_status()
+        date, pages = parse_index(index.text, base_url)
+        if date is None or not pages:
+            raise ScrapeError(f"No station pages found on {index.url}; the site may be down or its markup changed")
+        resumed = checkpoints.begin(date, pages) if checkpoints else set()
+        if job:
+            job.report(0, len(pages), f"Fetching {len(pages) - len(resumed)} station pages")
+
+        semaphore = asyncio.Semaphore(concurrency)
+        done = 0
+
+        async def scrape_page(url):
+            nonlocal done
+            if job:
+                job.check_cancelled()
+            if url in resumed:
+                outcome, items, needs_js = "resumed", checkpoints.get(date, url).items, False
+            else:
+                headers = checkpoints.conditional_headers(date, url) if checkpoints else None
+                async with semaphore:
+                    response = await fetch(client, url, limiter, retries, backoff, headers=headers)
+                if response.status_code == 304 and checkpoints:
+                    outcome, items, needs_js = "not_modified", checkpoints.get(date, url).items, False
+                    checkpoints.record(date, url, None)
+                else:
+                    response.raise_for_status()
+                    digest = hashlib.sha256(response.content).hexdigest()
+                    stored = checkpoints.get(date, url) if checkpoints else None
+                    if stored is not None and stored.content_hash == digest and stored.items is not None:
+                        outcome, items, needs_js = "unchanged", stored.items, False
+                    else:
+                        items, needs_js = parse_station(response.text, date)
+                        outcome = "fetched"
+                    if checkpoints and needs_js:
+                        # The JS shell says nothing about the menu data behind it, so keep no
+                        # validators; the page stays incomplete until the browser fallback runs
+                        checkpoints.record(date, url, None, complete=False)
+                    elif checkpoints:
+                        checkpoints.record(
+                            date, url, items, content_hash=digest,
+                            etag=response.headers.get("etag"),
+                            last_modified=response.headers.get("last-modified"),
+                        )
+            outcomes[outcome] += 1
+            done += 1
+            if job:
+                job.report(done)
+            return url, items, needs_js
+
+        results = await asyncio.gather(*(scrape_page(page["url"]) for page in pages))
+
+    items, js_pages, empty_pages = [], [], []
+    for url, page_items, needs_js in results:
+        items.extend(page_items or [])
+        if needs_js:
+            js_pages.append(url)
+        elif not page_items:
+            empty_pages.append(url)
+    if empty_pages:
+        logger.warning(f"{len(empty_pages)} station pages had no menu items: {', '.join(empty_pages)}")
+    return {
+        "date": date, "items": items, "js_pages": js_pages, "empty_pages": empty_pages,
+        "pages": len(pages), "outcomes": outcomes,
+    }
+
+def render_with_selenium(urls) -> dict:
+    """Render client-side pages in headless Chrome; returns {url: html}"""
+    from selenium import webdriver
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    try:
+        pages = {}
+        for url in urls:
+            driver.get(url)
+            WebDriverWait(driver, 20).until(
+                expected_conditions.presence_of_element_located((By.CSS_SELECTOR, "article.menu-item"))
+            )
+            pages[url] = driver.page_source
+        return pages
+    finally:
+        driver.quit()
+
+def run_http_scrape(job, db, base_url=DINING_BASE_URL, transport=None, renderer=render_with_selenium):
+    """Scrape job target: HTTP for every page, Selenium only for JS-rendered ones, then bulk ingest"""
+    checkpoints = CheckpointStore(db)
+    result = asyncio.run(scrape_site(base_url, transport=transport, job=job, checkpoints=checkpoints))
+    items = result["items"]
+    if result["js_pages"]:
+        job.report(job.progress_done, message=f"Rendering {len(result['js_pages'])} pages with Selenium")
+        for url, html in renderer(result["js_pages"]).items():
+            job.check_cancelled()
+            page_items = parse_station(html, result["date"])[0]
+            checkpoints.record(result["date"], url, page_items)
+            items.extend(page_items)
+    job.check_cancelled()
+    if not items:
+        raise ScrapeError(f"No menu items parsed from {result['pages']} station pages")
+    # Only days that parsed pages actually produced items for are treated as complete
+    counts = ingest_menu(db, items, dates=sorted({item["date_available"] for item in items}))
+    job.report(result["pages"], result["pages"], "Scrape completed successfully")
+    return {
+        "meals_processed": len(items),
+        **counts,
+        "pages": result["pages"],
+        **{f"pages_{k}": v for k, v in result["outcomes"].items()},
+        "selenium_pages": len(result["js_pages"]),
+        "empty_pages": len(result["empty_pages"]),
+        "scraper_type": "HTTP",
+    }
+
+def fixture_transport(fixtures_dir=FIXTURES_DIR, latency: float = 0.0):
+    """httpx transport serving scraper_fixtures/: /menus -> index.html, /menus/<slug> -> <slug>.html
+
+    Station pages carry an ETag and honour If-None-Match, like a well-behaved origin.
+    """
+    fixtures_dir = Path(fixtures_dir)
+
+    async def handler(request: httpx.Request):
+        if latency:
+            await asyncio.sleep(latency)
+        path = request.url.path.rstrip("/")
+        name = "index" if path == INDEX_PATH else path.rsplit("/", 1)[-1]
+        page = fixtures_dir / f"{name}.html"
+        if not page.is_file():
+            return httpx.Response(404, text="Not found")
+        body = page.read_text()
+        etag = f'"{hashlib.sha1(body.encode()).hexdigest()[:16]}"'
+        if name != "index" and request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"etag": etag})
+        return httpx.Response(200, text=body, headers={"content-type": "text/html", "etag": etag})
+
+    return httpx.MockTransport(handler)
@@ -0,0 +1,191 @@
+"""Incremental maintenance of the daily_intake_totals rollup.
+
+Every write to intake_tracking goes through apply_intake()/remove_intake() in
+the same transaction, so summaries can read O(days) rows instead of
+aggregating every logged meal. When a re-scrape changes a meal that has
+already been logged, menu_ingest calls refresh_for_meals() in its transaction
+so the affected days are recomputed from the new values; later edits and
+deletes then subtract exactly what the rollup holds. rebuild() and check()
+are the escape hatches for any other drift.
+
+    python intake_totals.py rebuild [--user-id N]
+    python intake_totals.py check [--user-id N]
+"""
+import click
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from database import SessionLocal, insert_for
+from models import DailyIntakeTotal, IntakeTracking, Meal, Nutrient
+
+TOTAL_FIELDS = ("calories", "protein", "carbs", "fat", "sodium", "sugar", "fiber", "spent")
+TOLERANCE = 1e-6
+_NUTRIENT_TOTALS = tuple(f for f in TOTAL_FIELDS if f != "spent")
+
+# Only a meal's first nutrients row counts, as in meal_rows_query()
+_first_nutrient = select(func.min(Nutrient.id)).where(Nutrient.meal_id == Meal.id).correlate(Meal).scalar_subquery()
+
+def _aggregate_source(user_id=None):
+    """SELECT computing the rollup rows straight from intake_tracking"""
+    query = (
+        select(
+            IntakeTracking.user_id,
+            IntakeTracking.date,
+            func.count(IntakeTracking.id).label("meals_logged"),
+            *[func.coalesce(func.sum(getattr(Nutrient, f)), 0.0).label(f) for f in TOTAL_FIELDS if f != "spent"],
+            func.coalesce(func.sum(Meal.price), 0.0).label("spent"),
+        )
+        .select_from(IntakeTracking)
+        .join(Meal, Meal.id == IntakeTracking.meal_id)
+        .outerjoin(Nutrient, Nutrient.id == _first_nutrient)
+        .where(IntakeTracking.user_id.is_not(None), IntakeTracking.date.is_not(None))
+        .group_by(IntakeTracking.user_id, IntakeTracking.date)
+    )
+    if user_id is not None:
+        query = query.where(IntakeTracking.user_id == user_id)
+    return query
+
+def _meals_values(db: Session, meal_ids) -> dict:
+    """{meal_id: rollup contribution} for many meals in one query; unknown ids count as zero"""
+    rows = db.execute(
+        select(Meal.id, Meal.price, *[getattr(Nutrient, f) for f in _NUTRIENT_TOTALS])
+        .outerjoin(Nutrient, Nutrient.id == _first_nutrient)
+        .where(Meal.id.in_(set(meal_ids)))
+    )
+    values = {
+        meal_id: {
+            **{f: float(v or 0.0) for f, v in zip(_NUTRIENT_TOTALS, nutrients)},
+            "spent": float(price or 0.0),
+        }
+        for meal_id, price, *nutrients in rows
+    }
+    zero = {f: 0.0 for f in TOTAL_FIELDS}
+    return {meal_id: values.get(meal_id, zero) for meal_id in meal_ids}
+
+def _meal_values(db: Session, meal_id: int) -> dict:
+    return _meals_values(db, [meal_id])[meal_id]
+
+def _upsert_totals(db: Session, rows: list):
+    """Add each row's deltas onto its (user_id, date) rollup row, creating it if needed"""
+    insert = insert_for(db)
+    stmt = insert(DailyIntakeTotal)
+    table = DailyIntakeTotal.__table__
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id", "date"],
+        set_={f: table.c[f] + stmt.excluded[f] for f in ("meals_logged",) + TOTAL_FIELDS},
+    ), rows)
+
+def _apply_delta(db: Session, user_id: int, date, meal_id: int, sign: int):
+    if user_id is None or date is None:
+        return
+    values = {f: sign * v for f, v in _meal_values(db, meal_id).items()}
+    _upsert_totals(db, [{"user_id": user_id, "date": date, "meals_logged": sign, **values}])
+    if sign < 0:
+        db.execute(delete(DailyIntakeTotal).where(
+            DailyIntakeTotal.user_id == user_id,
+            DailyIntakeTotal.date == date,
+            DailyIntakeTotal.meals_logged <= 0,
+        ))
+
+def apply_intake(db: Session, intake: IntakeTracking):
+    """Add a newly logged meal to its day's totals (caller commits)"""
+    _apply_delta(db, intake.user_id, intake.date, intake.meal_id, 1)
+
+def apply_intakes(db: Session, entries):
+    """Add many newly logged (user_id, date, meal_id) entries with one lookup and one upsert (caller commits)"""
+    entries = [e for e in entries if e[0] is not None and e[1] is not None]
+    if not entries:
+        return
+    values = _meals_values(db, [meal_id for _, _, meal_id in entries])
+    deltas = {}
+    for user_id, date, meal_id in entries:
+        row = deltas.setdefault((user_id, date), {"meals_logged": 0, **{f: 0.0 for f in TOTAL_FIELDS}})
+        row["meals_logged"] += 1
+        for f, v in values[meal_id].items():
+            row[f] += v
+    _upsert_totals(db, [{"user_id": user_id, "date": date, **row} for (user_id, date), row in deltas.items()])
+
+def remove_intake(db: Session, intake: IntakeTracking):
+    """Subtract a deleted or about-to-be-edited intake row from its day's totals (caller commits)"""
+    _apply_delta(db, intake.user_id, intake.date, intake.meal_id, -1)
+
+def refresh_for_meals(db: Session, meal_ids) -> int:
+    """Recompute the rollup rows of every (user_id, date) that logged one of meal_ids (caller commits)
+
+    For meals whose nutrients or price were just replaced, so the totals match the new values.
+    """
+    meal_ids = set(meal_ids)
+    if not meal_ids:
+        return 0
+    keys = db.execute(
+        select(IntakeTracking.user_id, IntakeTracking.date)
+        .where(IntakeTracking.meal_id.in_(meal_ids), IntakeTracking.user_id.is_not(None), IntakeTracking.date.is_not(None))
+        .distinct()
+    ).all()
+    if not keys:
+        return 0
+    user_ids = {user_id for user_id, _ in keys}
+    dates = {date for _, date in keys}
+    # Recomputing every (user, date) in the cross product is a superset of the affected rows, and still exact
+    db.execute(delete(DailyIntakeTotal).where(DailyIntakeTotal.user_id.in_(user_ids), DailyIntakeTotal.date.in_(dates)))
+    source = _aggregate_source().where(IntakeTracking.user_id.in_(user_ids), IntakeTracking.date.in_(dates))
+    columns = ["user_id", "date", "meals_logged", *TOTAL_FIELDS]
+    return db.execute(DailyIntakeTotal.__table__.insert().from_select(columns, source)).rowcount
+
+def rebuild(db: Session, user_id=None) -> int:
+    """Recompute the rollup from intake_tracking, for every user or just one"""
+    purge = delete(DailyIntakeTotal)
+    if user_id is not None:
+        purge = purge.where(DailyIntakeTotal.user_id == user_id)
+    db.execute(purge)
+    columns = ["user_id", "date", "meals_logged", *TOTAL_FIELDS]
+    result = db.execute(DailyIntakeTotal.__table__.insert().from_select(columns, _aggregate_source(user_id)))
+    db.commit()
+    return result.rowcount
+
+def check(db: Session, user_id=None) -> list:
+    """Return the (user_id, date) keys where the rollup disagrees with intake_tracking"""
+    expected = {(r.user_id, r.date): r for r in db.execute(_aggregate_source(user_id))}
+    stored_query = db.query(DailyIntakeTotal)
+    if user_id is not None:
+        stored_query = stored_query.filter(DailyIntakeTotal.user_id == user_id)
+    stored = {(r.user_id, r.date): r for r in stored_query}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        want, have = expected.get(key), stored.get(key)
+        if want is None or have is None:
+            mismatches.append({"user_id": key[0], "date": key[1], "reason": "missing" if have is None else "orphaned"})
+            continue
+        diffs = [f for f in ("meals_logged",) + TOTAL_FIELDS if abs(getattr(want, f) - getattr(have, f)) > TOLERANCE]
+        if diffs:
+            mismatches.append({"user_id": key[0], "date": key[1], "reason": "differs", "fields": diffs})
+    return mismatches
+
+@click.group()
+def cli():
+    pass
+
+@cli.command("rebuild")
+@click.option("--user-id", type=int, default=None, help="Only rebuild this user's rows")
+def rebuild_command(user_id):
+    db = SessionLocal()
+    try:
+        click.echo(f"Rebuilt {rebuild(db, user_id)} daily total rows")
+    finally:
+        db.close()
+
+@cli.command("check")
+@click.option("--user-id", type=int, default=None, help="Only check this user's rows")
+def check_command(user_id):
+    db = SessionLocal()
+    try:
+        mismatches = check(db, user_id)
+    finally:
+        db.close()
+    for m in mismatches:
+        click.echo(m)
+    click.echo(f"{len(mismatches)} inconsistent rows")
+    raise SystemExit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    cli()
@@ -1,10 +1,23 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from api_meals import router as meals_router
 from api_users import router as users_router
 from api_admin import router as admin_router
+from database import async_engine, engine, pool_stats
+from menu_cache import menu_cache
+from menu_matrix import matrix_cache
+from metrics import instrument_engine, render_metrics, setup_metrics
+from query_inspector import setup_query_inspector
+from user_filters import preference_cache
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Close pooled async connections cleanly (aiosqlite/asyncpg) on shutdown
+    await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,8 +25,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+setup_metrics(app, pool_stats, {"menu": menu_cache, "menu_matrix": matrix_cache, "preferences": preference_cache})
+setup_query_inspector(app, [engine, async_engine.sync_engine])
+
 app.include_router(meals_router)
 app.include_router(users_router)
 app.include_router(admin_router)
@@ -22,4 +41,9 @@ app.include_router(admin_router)
 def read_root():
     return {"message": "Welcome to MacMealMatch API!"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 # Placeholder: Add endpoints for meals, users, preferences, etc. 
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""Branch-and-bound meal plan solver.
+
+Picks exactly `slots` distinct meals from a day's menu for a compiled
+UserFilter. Hard constraints:
+  * every meal passes the filter (allergies, dietary tags, budget_per_meal)
+  * the whole plan within budget_per_day
+Soft goals are the filter's parsed (nutrient, is_min, target) goals, scored
+as the relative shortfall/excess against each target, with total price as a
+small tie-breaker.
+
+The search is depth-first over candidates sorted best-first, seeded with a
+greedy incumbent, and prunes with an optimistic bound on the remaining slots.
+It stops at the time budget and returns the best plan found so far.
+"""
+import time
+
+from fields import NUTRIENT_FIELDS
+from user_filters import NO_PREFERENCES, UserFilter
+
+PRICE_WEIGHT = 0.001  # per dollar; only breaks ties between equally good plans
+CHECK_EVERY = 256  # nodes between clock reads
+
+class _Search:
+    def __init__(self, candidates, goals, slots, budget, deadline):
+        self.goals = goals
+        self.slots = slots
+        self.budget = budget
+        self.deadline = deadline
+        self.n = len(candidates)
+        self.prices = [c["price"] for c in candidates]
+        self.values = [[c["values"][g[0]] for g in goals] for c in candidates]
+        # Suffix bounds: the cheapest price and the most (for min goals) or least
+        # (for max goals) of each goal nutrient still available from position i on
+        self.min_price = [0.0] * (self.n + 1)
+        self.best_value = [[0.0] * len(goals) for _ in range(self.n + 1)]
+        self.min_price[self.n] = float("inf")
+        self.best_value[self.n] = [0.0 if is_min else float("inf") for _, is_min, _ in goals]
+        for i in range(self.n - 1, -1, -1):
+            self.min_price[i] = min(self.prices[i], self.min_price[i + 1])
+            self.best_value[i] = [
+                max(v, b) if is_min else min(v, b)
+                for v, b, (_, is_min, _) in zip(self.values[i], self.best_value[i + 1], goals)
+            ]
+        self.best_score = float("inf")
+        self.best = None
+        self.nodes = 0
+        self.timed_out = False
+
+    def score(self, totals, cost) -> float:
+        penalty = 0.0
+        for (_, is_min, target), total in zip(self.goals, totals):
+            gap = target - total if is_min else total - target
+            if gap > 0:
+                penalty += gap / target
+        return penalty + cost * PRICE_WEIGHT
+
+    def bound(self, start, remaining, totals, cost) -> float:
+        """Optimistic score of any completion picking `remaining` meals from start onwards"""
+        penalty = 0.0
+        for (_, is_min, target), total, best in zip(self.goals, totals, self.best_value[start]):
+            if is_min:
+                gap = target - total - remaining * best
+            else:
+                gap = total + remaining * best - target
+            if gap > 0:
+                penalty += gap / target
+        return penalty + (cost + remaining * self.min_price[start]) * PRICE_WEIGHT
+
+    def offer(self, chosen, totals, cost):
+        s = self.score(totals, cost)
+        if s < self.best_score:
+            self.best_score = s
+            self.best = list(chosen)
+
+    def run(self, start, chosen, totals, cost):
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0 and time.perf_counter() > self.deadline:
+            self.timed_out = True
+        if self.timed_out:
+            return
+        remaining = self.slots - len(chosen)
+        if remaining == 0:
+            self.offer(chosen, totals, cost)
+            return
+        for i in range(start, self.n - remaining + 1):
+            if self.budget is not None and cost + remaining * self.min_price[i] > self.budget:
+                # min_price is non-decreasing in i, so no later branch fits either
+                return
+            if self.bound(i, remaining, totals, cost) >= self.best_score:
+                # Bounds only tighten as i grows, so the rest of this level is pruned too
+                return
+            price = self.prices[i]
+            rest = (remaining - 1) * self.min_price[i + 1] if remaining > 1 else 0.0
+            if self.budget is not None and cost + price + rest > self.budget:
+                continue
+            chosen.append(i)
+            self.run(i + 1, chosen, [t + v for t, v in zip(totals, self.values[i])], cost + price)
+            chosen.pop()
+            if self.timed_out:
+                return
+
+def plan_meals(meals, user_filter: UserFilter = NO_PREFERENCES, slots=3, time_budget=0.08) -> dict:
+    """Choose `slots` meals from `meals` (dicts shaped like MealSchema) for a compiled user filter.
+
+    Returns {"meals": [...], "feasible": bool, "optimal": bool, "score": float, "nodes": int}.
+    `optimal` is False when the time budget cut the search short.
+    """
+    deadline = time.perf_counter() + time_budget
+    goals = user_filter.goals
+    budget_per_day = user_filter.budget_per_day
+
+    candidates = []
+    for meal in meals:
+        if not user_filter.matches(meal):
+            continue
+        nutrients = meal.get("nutrients") or {}
+        candidates.append({
+            "meal": meal,
+            "price": float(meal.get("price") or 0.0),
+            "values": {n: float(nutrients.get(n) or 0.0) for n in NUTRIENT_FIELDS},
+        })
+    if len(candidates) < slots:
+        return {"meals": [], "feasible": False, "optimal": True, "score": None, "nodes": 0}
+
+    # Best-first ordering: meals that move min-goals most per unit of max-goal
+    # "spend" come first, which makes the greedy incumbent and early leaves strong
+    def merit(c):
+        gain = sum(c["values"][n] / t for n, is_min, t in goals if is_min)
+        cost = sum(c["values"][n] / t for n, is_min, t in goals if not is_min)
+        return -(gain - cost) + c["price"] * PRICE_WEIGHT
+    candidates.sort(key=merit)
+
+    search = _Search(candidates, goals, slots, budget_per_day, deadline)
+    greedy = []
+    for i in range(len(candidates)):
+        if len(greedy) == slots:
+            break
+        cost = sum(search.prices[j] for j in greedy) + search.prices[i]
+        if budget_per_day is None or cost <= budget_per_day:
+            greedy.append(i)
+    if len(greedy) == slots:
+        totals = [sum(search.values[j][g] for j in greedy) for g in range(len(goals))]
+        search.offer(greedy, totals, sum(search.prices[j] for j in greedy))
+
+    search.run(0, [], [0.0] * len(goals), 0.0)
+    if search.best is None:
+        return {"meals": [], "feasible": False, "optimal": not search.timed_out, "score": None, "nodes": search.nodes}
+    return {
+        "meals": [candidates[i]["meal"] for i in search.best],
+        "feasible": True,
+        "optimal": not search.timed_out,
+        "score": search.best_score,
+        "nodes": search.nodes,
+    }
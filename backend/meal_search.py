@@ -0,0 +1,171 @@
+"""Typo-tolerant, prefix-aware meal search over name, station and tags.
+
+Menus repeat the same dishes day after day, so search ranks dishes, one per
+(name, station), and returns the most recent occurrence of each (or the
+occurrence on `date` when one is given).
+
+PostgreSQL: a pg_trgm GIN index over SEARCH_DOCUMENT (see the
+add_meal_search_index migration) answers `q <% document` and results are
+ranked by word_similarity().
+
+SQLite fallback: SearchIndex keeps an in-memory inverted trigram index of
+the distinct dishes. It is tied to the menu version stored in menu_state, so
+the first search after a scrape in any process (or the scrape job itself,
+via refresh_search_index) rebuilds it; other workers notice within
+MENU_VERSION_TTL seconds. Scores combine the share of query trigrams a dish name contains, a bonus
+for words the query is a prefix of, and a weaker match on station and tags.
+"""
+import re
+import threading
+from collections import Counter, defaultdict
+
+from sqlalchemy import func, literal, literal_column, select, text
+from sqlalchemy.dialects.postgresql import distinct_on
+from sqlalchemy.orm import Session
+
+from menu_cache import menu_version
+from models import Meal
+
+# Must stay identical to the indexed expression in the add_meal_search_index migration
+SEARCH_DOCUMENT_SQL = "lower(name || ' ' || coalesce(station, '') || ' ' || coalesce(tags::text, ''))"
+PG_THRESHOLD = 0.4
+MIN_COVERAGE = 0.5  # share of the query's trigrams a dish must contain to match at all
+PREFIX_WEIGHT = 0.25
+EXTRA_WEIGHT = 0.6  # station/tag matches rank below name matches
+
+_word = re.compile(r"[a-z0-9]+")
+
+def words(value: str) -> list:
+    return _word.findall((value or "").lower())
+
+def trigrams(tokens) -> set:
+    """pg_trgm-style trigrams: each word padded with two leading spaces and one trailing"""
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class SearchIndex:
+    def __init__(self, rows):
+        """rows: (meal_id, name, station, tags, date_available), any order"""
+        dishes = {}
+        for meal_id, name, station, tags, date_available in rows:
+            key = (" ".join(words(name)), station or "")
+            dish = dishes.get(key)
+            if dish is None:
+                dish = dishes[key] = {"occurrences": [], "tags": tags, "latest": None}
+            dish["occurrences"].append((date_available, meal_id))
+            if dish["latest"] is None or (date_available and date_available > dish["latest"]):
+                dish["latest"], dish["tags"] = date_available, tags
+
+        self.name_words = []
+        self.name_size = []
+        self.by_date = []
+        self.latest_meal = []
+        name_postings, extra_postings = defaultdict(list), defaultdict(list)
+        for doc, ((name, station), dish) in enumerate(dishes.items()):
+            tags = dish["tags"] if isinstance(dish["tags"], list) else [dish["tags"]] if dish["tags"] else []
+            name_tokens = name.split()
+            name_grams = trigrams(name_tokens)
+            for gram in name_grams:
+                name_postings[gram].append(doc)
+            for gram in trigrams(words(station) + [w for t in tags for w in words(t)]) - name_grams:
+                extra_postings[gram].append(doc)
+            occurrences = sorted(dish["occurrences"], key=lambda o: (o[0] is not None, o[0]), reverse=True)
+            self.name_words.append(name_tokens)
+            self.name_size.append(len(name_grams))
+            self.by_date.append({d: meal_id for d, meal_id in reversed(occurrences)})
+            self.latest_meal.append(occurrences[0][1])
+        self.name_postings = dict(name_postings)
+        self.extra_postings = dict(extra_postings)
+
+    def __len__(self):
+        return len(self.latest_meal)
+
+    def search(self, q: str, date=None, limit: int = 20) -> list:
+        """[(meal_id, score)] best first"""
+        q_words = words(q)
+        q_grams = trigrams(q_words)
+        if not q_grams:
+            return []
+        name_hits, extra_hits = Counter(), Counter()
+        for gram in q_grams:
+            name_hits.update(self.name_postings.get(gram, ()))
+            extra_hits.update(self.extra_postings.get(gram, ()))
+
+        total = len(q_grams)
+        scored = []
+        for doc in name_hits.keys() | extra_hits.keys():
+            name_shared = name_hits.get(doc, 0)
+            coverage = name_shared / total
+            # Station/tag trigrams only count on top of the name, weighted down
+            extra = (name_shared + extra_hits.get(doc, 0)) / total * EXTRA_WEIGHT
+            if max(coverage, extra) < MIN_COVERAGE:
+                continue
+            prefixed = sum(any(w.startswith(qw) for w in self.name_words[doc]) for qw in q_words)
+            score = max(coverage, extra) + PREFIX_WEIGHT * prefixed / len(q_words)
+            # Among equal matches prefer the tighter name ("Burger" over "Loaded Burger Combo")
+            score += 0.1 * name_shared / max(self.name_size[doc], 1)
+            if date is not None:
+                meal_id = self.by_date[doc].get(date)
+                if meal_id is None:
+                    continue
+            else:
+                meal_id = self.latest_meal[doc]
+            scored.append((round(score, 4), meal_id))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return [(meal_id, score) for score, meal_id in scored[:limit]]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_search_index(db: Session) -> SearchIndex:
+    """In-memory index for the shared menu version, rebuilt after a menu write by any process"""
+    global _index
+    version = menu_version(db)
+    current = _index
+    if current is not None and current[0] == version:
+        return current[1]
+    with _index_lock:
+        if _index is None or _index[0] != version:
+            rows = db.execute(
+                select(Meal.id, Meal.name, Meal.station, Meal.tags, Meal.date_available)
+                .where(Meal.removed == False)  # noqa: E712
+            ).all()
+            _index = (version, SearchIndex(rows))
+        return _index[1]
+
+def refresh_search_index(db: Session):
+    """Rebuild now (e.g. at the end of a scrape) so the next search doesn't pay for it"""
+    if db.get_bind().dialect.name != "postgresql":
+        get_search_index(db)
+
+async def search_meal_ids(db, q: str, date=None, limit: int = 20) -> list:
+    """[(meal_id, score)] for an AsyncSession, best first"""
+    if db.bind.dialect.name == "postgresql":
+        return await _search_postgres(db, q, date, limit)
+    index = await db.run_sync(get_search_index)
+    return index.search(q, date, limit)
+
+async def _search_postgres(db, q: str, date, limit: int) -> list:
+    query = " ".join(words(q))
+    if not query:
+        return []
+    document = literal_column(SEARCH_DOCUMENT_SQL)
+    score = func.word_similarity(literal(query), document).label("score")
+    # The threshold of the indexable <% operator; SET LOCAL only lasts for this transaction
+    await db.execute(text(f"SET LOCAL pg_trgm.word_similarity_threshold = {PG_THRESHOLD}"))
+    dishes = (
+        select(Meal.id, score)
+        .where(literal(query).op("<%")(document), Meal.removed == False)  # noqa: E712
+        .ext(distinct_on(Meal.name, Meal.station))
+        .order_by(Meal.name, Meal.station, Meal.date_available.desc())
+    )
+    if date is not None:
+        dishes = dishes.where(Meal.date_available == date)
+    dishes = dishes.subquery()
+    rows = await db.execute(
+        select(dishes.c.id, dishes.c.score).order_by(dishes.c.score.desc(), dishes.c.id).limit(limit)
+    )
+    return [(meal_id, round(float(s), 4)) for meal_id, s in rows]
@@ -0,0 +1,131 @@
+import datetime
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from models import MenuState
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after ttl seconds.
+
+    Values are stored as-is; the menu endpoints keep pre-serialized JSON bytes
+    here so a hit skips both the database and Pydantic validation.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate=None):
+        """Drop every entry, or only those whose key matches predicate"""
+        with self._lock:
+            if predicate is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+menu_cache = TTLCache(
+    maxsize=int(os.getenv("MENU_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("MENU_CACHE_TTL", "300")),
+)
+
+# The menu version lives in the menu_state row so every worker agrees on it.
+# Each process re-reads it at most every MENU_VERSION_TTL seconds, which bounds
+# how long another worker's write can go unnoticed here.
+MENU_VERSION_TTL = float(os.getenv("MENU_VERSION_TTL", "2"))
+MENU_STATE_ID = 1
+
+_seen_version = None  # (expires_at, version)
+_version_lock = threading.Lock()
+_version_query = select(MenuState.version).where(MenuState.id == MENU_STATE_ID)
+
+def _fresh_version():
+    seen = _seen_version
+    if seen is not None and seen[0] > time.monotonic():
+        return seen[1]
+    return None
+
+def _remember(version) -> str:
+    global _seen_version
+    version = version or "0"  # no menu_state row until the first write
+    with _version_lock:
+        if _seen_version is not None and _seen_version[1] != version:
+            menu_cache.invalidate()  # another process changed the menu
+        _seen_version = (time.monotonic() + MENU_VERSION_TTL, version)
+    return version
+
+def menu_version(db: Session) -> str:
+    """Current menu version; one small query per MENU_VERSION_TTL seconds"""
+    return _fresh_version() or _remember(db.scalar(_version_query))
+
+async def load_menu_version(db) -> str:
+    """menu_version() for an AsyncSession"""
+    return _fresh_version() or _remember(await db.scalar(_version_query))
+
+def menu_etag(key, version: str) -> str:
+    """Strong ETag for the representation cached under key at a menu version"""
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+    return f'"{version}.{digest}"'
+
+def bump_menu_version(db: Session):
+    """Give the menu a new version inside db's transaction; committing publishes it to every worker"""
+    values = {"version": uuid.uuid4().hex, "updated_at": datetime.datetime.utcnow()}
+    if not db.execute(update(MenuState).where(MenuState.id == MENU_STATE_ID).values(**values)).rowcount:
+        db.execute(insert(MenuState).values(id=MENU_STATE_ID, **values))
+
+def invalidate_menu():
+    """Drop this process's cached version and menus; call after committing a bump_menu_version()"""
+    global _seen_version
+    with _version_lock:
+        _seen_version = None
+    menu_cache.invalidate()
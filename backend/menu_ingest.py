@@ -0,0 +1,177 @@
+"""Bulk, change-detecting ingest of scraped menu items.
+
+Scrapers hand over a batch of items shaped like MealSchema (without ids).
+Each item is identified by (name, station, date_available) and fingerprinted
+with a hash of everything else, so a re-scrape of the same day only touches
+rows whose content actually changed:
+
+  * one executemany INSERT per table for new meals
+  * one executemany UPDATE for changed meals, with their nutrient/allergen
+    rows replaced in bulk
+  * one DELETE per table for meals that disappeared from a scraped date;
+    meals still referenced by favorites or intake history are detached
+    instead (Meal.removed), which takes them off every menu read path
+  * a detached meal that shows up again is re-listed as a changed meal
+
+A date that has meals is never emptied by a batch with no items for it:
+that is what a broken or maintenance page looks like, not a real menu.
+
+Intake history of changed meals is re-totalled (intake_totals.refresh_for_meals)
+in the same transaction, so the daily rollup never mixes old and new values.
+
+Everything runs in a single transaction, and the menu version is bumped only
+when something changed, so caches and ETags survive no-op re-scrapes.
+"""
+import hashlib
+import json
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+from fields import ALLERGEN_FIELDS, NUTRIENT_FIELDS, as_date
+from intake_totals import refresh_for_meals
+from menu_cache import bump_menu_version, invalidate_menu
+from models import Allergen, Favorite, IntakeTracking, Meal, Nutrient
+
+def _key(name, station, date) -> tuple:
+    return (name, station or "", str(date))
+
+def _canonical(item: dict) -> dict:
+    nutrients = item.get("nutrients") or {}
+    allergens = item.get("allergens") or {}
+    tags = item.get("tags") or []
+    return {
+        "serving_time": item.get("serving_time"),
+        "price": item.get("price"),
+        "tags": [tags] if isinstance(tags, str) else list(tags),
+        "nutrients": {f: nutrients.get(f) for f in NUTRIENT_FIELDS} if item.get("nutrients") else None,
+        "allergens": {f: allergens.get(f) for f in ALLERGEN_FIELDS} if item.get("allergens") else None,
+    }
+
+def content_hash(item: dict) -> str:
+    canonical = json.dumps(_canonical(item), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+def _child_rows(meal_id: int, item: dict, fields) -> dict:
+    values = item.get(fields) or {}
+    columns = NUTRIENT_FIELDS if fields == "nutrients" else ALLERGEN_FIELDS
+    return {"meal_id": meal_id, **{f: values.get(f) for f in columns}}
+
+class EmptyMenuError(ValueError):
+    """A batch would remove every meal of a date it covers"""
+
+def ingest_menu(db: Session, items, dates=None) -> dict:
+    """Upsert a batch of scraped items; returns added/changed/removed/unchanged/detached counts.
+
+    `dates` are the days this batch covers completely (defaults to every date
+    in the batch); meals on those days that are missing from the batch are
+    removed. Raises EmptyMenuError, before writing anything, if one of those
+    days has meals but no items in the batch.
+    """
+    batch = {}
+    for item in items:
+        item = {**item, "date_available": as_date(item["date_available"])}
+        batch[_key(item["name"], item.get("station"), item["date_available"])] = item
+    if dates is None:
+        dates = {item["date_available"] for item in batch.values()}
+    dates = {as_date(d) for d in dates}
+
+    existing = {}
+    if dates:
+        rows = db.execute(
+            select(Meal.id, Meal.name, Meal.station, Meal.date_available, Meal.content_hash, Meal.removed)
+            .where(Meal.date_available.in_(dates))
+        )
+        for row in rows:
+            existing[_key(row.name, row.station, row.date_available)] = (row.id, row.content_hash, row.removed)
+
+    listed_dates = {key[2] for key, (_, _, removed) in existing.items() if not removed}
+    empty = sorted(d for d in dates if str(d) in listed_dates and not any(item["date_available"] == d for item in batch.values()))
+    if empty:
+        raise EmptyMenuError(f"Refusing to remove every meal on {', '.join(map(str, empty))}: the batch has no items for it")
+
+    added, changed, unchanged = [], [], 0
+    for key, item in batch.items():
+        digest = content_hash(item)
+        current = existing.get(key)
+        if current is None:
+            added.append((item, digest))
+        elif current[1] != digest or current[2]:
+            changed.append((current[0], item, digest))
+        else:
+            unchanged += 1
+    removed_ids = [meal_id for key, (meal_id, _, removed) in existing.items() if key not in batch and not removed]
+
+    def meal_values(item, digest):
+        canonical = _canonical(item)
+        return {
+            "name": item["name"],
+            "station": item.get("station"),
+            "serving_time": canonical["serving_time"],
+            "date_available": item["date_available"],
+            "price": canonical["price"],
+            "tags": canonical["tags"],
+            "content_hash": digest,
+            "removed": False,
+        }
+
+    detached = []
+    try:
+        if added:
+            new_ids = db.execute(
+                insert(Meal.__table__).returning(Meal.__table__.c.id, sort_by_parameter_order=True),
+                [meal_values(item, digest) for item, digest in added],
+            ).scalars().all()
+            pairs = list(zip(new_ids, (item for item, _ in added)))
+            nutrients = [_child_rows(i, item, "nutrients") for i, item in pairs if item.get("nutrients")]
+            allergens = [_child_rows(i, item, "allergens") for i, item in pairs if item.get("allergens")]
+            if nutrients:
+                db.execute(insert(Nutrient), nutrients)
+            if allergens:
+                db.execute(insert(Allergen), allergens)
+
+        if changed:
+            ids = [meal_id for meal_id, _, _ in changed]
+            db.execute(
+                update(Meal.__table__).where(Meal.__table__.c.id == bindparam("meal_id")),
+                [{"meal_id": meal_id, **meal_values(item, digest)} for meal_id, item, digest in changed],
+            )
+            db.execute(delete(Nutrient).where(Nutrient.meal_id.in_(ids)))
+            db.execute(delete(Allergen).where(Allergen.meal_id.in_(ids)))
+            nutrients = [_child_rows(i, item, "nutrients") for i, item, _ in changed if item.get("nutrients")]
+            allergens = [_child_rows(i, item, "allergens") for i, item, _ in changed if item.get("allergens")]
+            if nutrients:
+                db.execute(insert(Nutrient), nutrients)
+            if allergens:
+                db.execute(insert(Allergen), allergens)
+            # Logged intake of these meals was totalled with the old values
+            refresh_for_meals(db, ids)
+
+        if removed_ids:
+            # Favorites and intake history point at meal ids; detach those meals from the menu instead
+            referenced = set(db.execute(select(Favorite.meal_id).where(Favorite.meal_id.in_(removed_ids))).scalars())
+            referenced |= set(db.execute(select(IntakeTracking.meal_id).where(IntakeTracking.meal_id.in_(removed_ids))).scalars())
+            detached = sorted(referenced)
+            if detached:
+                db.execute(update(Meal).where(Meal.id.in_(detached)).values(removed=True))
+            doomed = [i for i in removed_ids if i not in referenced]
+            if doomed:
+                db.execute(delete(Nutrient).where(Nutrient.meal_id.in_(doomed)))
+                db.execute(delete(Allergen).where(Allergen.meal_id.in_(doomed)))
+                db.execute(delete(Meal).where(Meal.id.in_(doomed)))
+            removed_ids = doomed
+
+        if added or changed or removed_ids or detached:
+            bump_menu_version(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if added or changed or removed_ids or detached:
+        invalidate_menu()
+    return {
+        "added": len(added),
+        "changed": len(changed),
+        "removed": len(removed_ids),
+        "unchanged": unchanged,
+        "detached": len(detached),
+    }
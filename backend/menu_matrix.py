@@ -0,0 +1,208 @@
+"""Columnar, NumPy-backed view of a day's menu for bulk filtering and scoring.
+
+Instead of walking ORM objects per user, a menu is packed once into
+  * nutrients   float matrix (meals x NUTRIENT_FIELDS), missing values as 0
+  * allergens   uint16 bitmask per meal, bit i = ALLERGEN_FIELDS[i]
+  * prices      float vector, missing prices as 0
+  * tags        boolean matrix (meals x tag vocabulary)
+and many users' compiled preference filters are packed into matching arrays, so eligibility
+and scores for every (user, meal) pair come out of a handful of array ops.
+
+Each matrix also carries a feature matrix (nutrients and price scaled to
+reference amounts) for nearest-neighbour lookups such as "similar meals".
+
+Matrices are cached per date. When the menu version changes, the next lookup
+compares the date's (id, content_hash) fingerprint with the cached one and
+only rebuilds when that date's menu actually changed.
+"""
+import hashlib
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+from fields import ALLERGEN_FIELDS, NUTRIENT_FIELDS, normalize_name
+from menu_cache import TTLCache, menu_version
+from models import Meal
+
+MEALS_PER_DAY = 3  # daily goals are split evenly across this many meals when scoring one meal
+# Reference daily values (and a typical meal price) that put every feature on a comparable
+# scale; fixed rather than fitted, so vectors from different days are directly comparable
+FEATURE_SCALE = {"calories": 2000.0, "protein": 50.0, "carbs": 275.0, "fat": 78.0,
+                 "sodium": 2300.0, "sugar": 50.0, "fiber": 28.0, "price": 10.0}
+
+def allergen_bits(names) -> int:
+    """Bitmask for a list of allergen names; unknown names are ignored"""
+    mask = 0
+    for name in names or []:
+        name = normalize_name(name)
+        if name in ALLERGEN_FIELDS:
+            mask |= 1 << ALLERGEN_FIELDS.index(name)
+    return mask
+
+class MenuMatrix:
+    def __init__(self, meals):
+        """Build from Meal ORM objects (nutrients/allergens loaded) or MealSchema-shaped dicts"""
+        n = len(meals)
+        self.meal_ids = np.empty(n, dtype=np.int64)
+        self.nutrients = np.zeros((n, len(NUTRIENT_FIELDS)), dtype=np.float64)
+        self.allergens = np.zeros(n, dtype=np.uint16)
+        self.prices = np.zeros(n, dtype=np.float64)
+        self.tag_ids = {}
+        meal_tags = []
+        for row, meal in enumerate(meals):
+            if isinstance(meal, dict):
+                meal_id, price, tags = meal["id"], meal.get("price"), meal.get("tags")
+                nutrients, allergens = meal.get("nutrients"), meal.get("allergens")
+                get = lambda obj, f: obj.get(f)
+            else:
+                meal_id, price, tags = meal.id, meal.price, meal.tags
+                nutrients = meal.nutrients[0] if meal.nutrients else None
+                allergens = meal.allergens[0] if meal.allergens else None
+                get = getattr
+            self.meal_ids[row] = meal_id
+            self.prices[row] = price or 0.0
+            if nutrients:
+                self.nutrients[row] = [get(nutrients, f) or 0.0 for f in NUTRIENT_FIELDS]
+            if allergens:
+                self.allergens[row] = sum(1 << i for i, f in enumerate(ALLERGEN_FIELDS) if get(allergens, f))
+            if isinstance(tags, str):
+                tags = [tags]
+            ids = [self.tag_ids.setdefault(normalize_name(t), len(self.tag_ids)) for t in tags or []]
+            meal_tags.append(ids)
+        self.tags = np.zeros((n, max(len(self.tag_ids), 1)), dtype=bool)
+        for row, ids in enumerate(meal_tags):
+            self.tags[row, ids] = True
+        self.row_of = {int(meal_id): row for row, meal_id in enumerate(self.meal_ids)}
+        scale = np.array([FEATURE_SCALE[f] for f in NUTRIENT_FIELDS] + [FEATURE_SCALE["price"]])
+        self.features = np.column_stack([self.nutrients, self.prices]) / scale
+
+    def __len__(self):
+        return len(self.meal_ids)
+
+    def nearest(self, vector, k: int = 5, exclude_allergens=(), required_tags=(), exclude_ids=()) -> list:
+        """[(meal_id, distance)] for the k meals closest to a features row, skipping excluded ones"""
+        distances = np.sqrt(((self.features - vector) ** 2).sum(axis=1))
+        ok = (self.allergens & allergen_bits(exclude_allergens)) == 0
+        for tag in required_tags:
+            tag_id = self.tag_ids.get(normalize_name(tag))
+            if tag_id is None:
+                return []
+            ok &= self.tags[:, tag_id]
+        for meal_id in exclude_ids:
+            if meal_id in self.row_of:
+                ok[self.row_of[meal_id]] = False
+        candidates = np.flatnonzero(ok)
+        ranked = candidates[np.argsort(distances[candidates], kind="stable")[:k]]
+        return [(int(self.meal_ids[j]), float(distances[j])) for j in ranked]
+
+    def compile(self, filters) -> "PreferenceBatch":
+        return PreferenceBatch(self, filters)
+
+    def eligible(self, batch: "PreferenceBatch") -> np.ndarray:
+        """Boolean (users x meals) matrix of meals that pass every hard constraint"""
+        ok = (self.allergens[None, :] & batch.allergens[:, None]) == 0
+        ok &= self.prices[None, :] <= batch.budget_per_meal[:, None]
+        # A user asking for a tag this menu has never seen can match nothing
+        ok &= ~batch.unknown_tags[:, None]
+        if batch.required_tags.any():
+            missing = batch.required_tags.astype(np.int32) @ (~self.tags).T.astype(np.int32)
+            ok &= missing == 0
+        return ok
+
+    def score(self, batch: "PreferenceBatch") -> np.ndarray:
+        """Float (users x meals) scores; higher is better, ineligible meals are -inf.
+
+        Each min goal contributes its attainment capped at 1, each max goal
+        subtracts its relative overshoot, against per-meal targets.
+        """
+        scores = np.zeros((len(batch), len(self)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # One 2-D pass per nutrient column that somebody actually has a goal on
+            for col in range(len(NUTRIENT_FIELDS)):
+                values = self.nutrients[None, :, col]
+                if batch.has_min[:, col].any():
+                    attained = np.clip(values / batch.min_targets[:, col, None], 0.0, 1.0)
+                    scores += np.where(batch.has_min[:, col, None], attained, 0.0)
+                if batch.has_max[:, col].any():
+                    overshoot = np.maximum(values / batch.max_targets[:, col, None] - 1.0, 0.0)
+                    scores -= np.where(batch.has_max[:, col, None], overshoot, 0.0)
+        return np.where(self.eligible(batch), scores, -np.inf)
+
+    def top_k(self, batch: "PreferenceBatch", k: int = 10) -> list:
+        """Best k eligible meal ids per user, in batch order"""
+        scores = self.score(batch)
+        k = min(k, len(self))
+        if k == 0:
+            return [[] for _ in range(len(batch))]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        ranked = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+        return [
+            [int(self.meal_ids[j]) for j in row if np.isfinite(scores[u, j])]
+            for u, row in enumerate(ranked)
+        ]
+
+class PreferenceBatch:
+    """Many users' preferences as arrays aligned with one MenuMatrix's columns.
+
+    `filters` are compiled user_filters.UserFilter objects.
+    """
+
+    def __init__(self, menu: MenuMatrix, filters):
+        u = len(filters)
+        width = len(NUTRIENT_FIELDS)
+        self.allergens = np.zeros(u, dtype=np.uint16)
+        self.required_tags = np.zeros((u, menu.tags.shape[1]), dtype=bool)
+        self.unknown_tags = np.zeros(u, dtype=bool)
+        self.budget_per_meal = np.full(u, np.inf)
+        self.min_targets = np.full((u, width), np.nan)
+        self.max_targets = np.full((u, width), np.nan)
+        for row, user_filter in enumerate(filters):
+            self.allergens[row] = user_filter.allergen_mask
+            for tag in user_filter.tags:
+                tag_id = menu.tag_ids.get(tag)
+                if tag_id is None:
+                    self.unknown_tags[row] = True
+                else:
+                    self.required_tags[row, tag_id] = True
+            if user_filter.budget_per_meal is not None:
+                self.budget_per_meal[row] = user_filter.budget_per_meal
+            for nutrient, is_min, target in user_filter.goals:
+                targets = self.min_targets if is_min else self.max_targets
+                targets[row, NUTRIENT_FIELDS.index(nutrient)] = target / MEALS_PER_DAY
+        self.has_min = ~np.isnan(self.min_targets)
+        self.has_max = ~np.isnan(self.max_targets)
+
+    def __len__(self):
+        return len(self.allergens)
+
+matrix_cache = TTLCache(maxsize=16, ttl=3600)
+
+def _menu_fingerprint(db: Session, date) -> str:
+    rows = db.execute(
+        select(Meal.id, Meal.content_hash)
+        .where(Meal.date_available == date, Meal.removed == False)  # noqa: E712
+        .order_by(Meal.id)
+    ).all()
+    return hashlib.sha1(repr([tuple(r) for r in rows]).encode()).hexdigest()
+
+def get_menu_matrix(db: Session, date) -> MenuMatrix:
+    """Menu matrix for a date, rebuilt only when that date's menu changed"""
+    version = menu_version(db)
+    entry = matrix_cache.get(str(date))
+    if entry is not None and entry[0] == version:
+        return entry[2]
+    # A scrape bumps the one global version; most cached dates are usually untouched by it
+    fingerprint = _menu_fingerprint(db, date)
+    if entry is not None and entry[1] == fingerprint:
+        matrix = entry[2]
+    else:
+        meals = (
+            db.query(Meal)
+            .options(selectinload(Meal.nutrients), selectinload(Meal.allergens))
+            .filter(Meal.date_available == date, Meal.removed == False)  # noqa: E712
+            .order_by(Meal.id)
+            .all()
+        )
+        matrix = MenuMatrix(meals)
+    matrix_cache.set(str(date), (version, fingerprint, matrix))
+    return matrix
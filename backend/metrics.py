@@ -0,0 +1,162 @@
+"""Prometheus metrics for the API, served on GET /metrics.
+
+Recorded per request by MetricsMiddleware (a plain ASGI middleware, so the
+cost is a few counter/histogram updates per request):
+  * request count by route template, method and status
+  * request latency histogram and in-flight requests
+  * number of SQL statements and time spent in them, via cursor-execute
+    hooks on both engines, attributed to the request through a contextvar
+Read at scrape time by a collector, so they cost nothing per request:
+  * connection pool occupancy, checkouts, timeouts and wait times
+  * menu / menu-matrix cache hits, misses, size and evictions
+Scrape job durations are observed by scrape_jobs when a job finishes.
+
+Metrics live in this process; with several uvicorn workers each one
+reports its own numbers, so scrape them per worker (or set
+PROMETHEUS_MULTIPROC_DIR per prometheus_client's multiprocess docs).
+"""
+import contextvars
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+REQUESTS = Counter("http_requests_total", "HTTP requests", ["method", "route", "status"])
+LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=LATENCY_BUCKETS)
+IN_FLIGHT = Gauge("http_requests_in_progress", "HTTP requests being served")
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements issued per request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+REQUEST_DB_TIME = Histogram("http_request_db_seconds", "Time spent in SQL per request", ["route"], buckets=LATENCY_BUCKETS)
+QUERIES = Counter("db_queries_total", "SQL statements executed", ["engine"])
+QUERY_LATENCY = Histogram("db_query_duration_seconds", "SQL statement latency", ["engine"], buckets=QUERY_BUCKETS)
+SCRAPE_JOBS = Histogram(
+    "scrape_job_duration_seconds", "Scrape job run time", ["status"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200),
+)
+
+class _RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+_request_stats = contextvars.ContextVar("request_db_stats", default=None)
+
+def instrument_engine(sync_engine, name: str):
+    """Count and time every statement on an engine (pass async_engine.sync_engine for async ones)"""
+    queries = QUERIES.labels(name)
+    latency = QUERY_LATENCY.labels(name)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        queries.inc()
+        latency.observe(elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+
+class MetricsMiddleware:
+    """ASGI middleware recording request count, latency and DB usage per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+        stats = _RequestStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            _request_stats.reset(token)
+            # Label by the matched route template, never the raw path, to keep cardinality bounded
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            REQUESTS.labels(method, route, str(status)).inc()
+            LATENCY.labels(method, route).observe(elapsed)
+            REQUEST_QUERIES.labels(route).observe(stats.queries)
+            REQUEST_DB_TIME.labels(route).observe(stats.db_time)
+
+class _StatsCollector:
+    """Exports pool and cache statistics that the app already keeps, read at scrape time"""
+
+    def __init__(self, pool_stats, caches):
+        self.pool_stats = pool_stats
+        self.caches = caches
+
+    def collect(self):
+        pools = self.pool_stats()
+        gauges = {
+            "size": GaugeMetricFamily("db_pool_size", "Configured pool size", labels=["engine"]),
+            "checked_out": GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["engine"]),
+            "overflow": GaugeMetricFamily("db_pool_overflow", "Overflow connections open", labels=["engine"]),
+            "wait_max_ms": GaugeMetricFamily("db_pool_wait_max_ms", "Longest checkout wait", labels=["engine"]),
+            "wait_avg_ms": GaugeMetricFamily("db_pool_wait_avg_ms", "Mean checkout wait", labels=["engine"]),
+        }
+        counters = {
+            "checkouts": CounterMetricFamily("db_pool_checkouts", "Connection checkouts", labels=["engine"]),
+            "timeouts": CounterMetricFamily("db_pool_timeouts", "Checkouts that timed out", labels=["engine"]),
+            "connects": CounterMetricFamily("db_pool_connects", "New DBAPI connections", labels=["engine"]),
+            "invalidations": CounterMetricFamily("db_pool_invalidations", "Invalidated connections", labels=["engine"]),
+        }
+        for engine_name, stats in pools.items():
+            for key, family in {**gauges, **counters}.items():
+                if key in stats:
+                    family.add_metric([engine_name], stats[key])
+        yield from gauges.values()
+        yield from counters.values()
+
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        evictions = CounterMetricFamily("cache_evictions", "Cache evictions", labels=["cache"])
+        size = GaugeMetricFamily("cache_size", "Cache entries", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "Cache hits / lookups", labels=["cache"])
+        for cache_name, cache in self.caches.items():
+            stats = cache.stats()
+            hits.add_metric([cache_name], stats["hits"])
+            misses.add_metric([cache_name], stats["misses"])
+            evictions.add_metric([cache_name], stats["evictions"])
+            size.add_metric([cache_name], stats["size"])
+            ratio.add_metric([cache_name], stats["hit_ratio"])
+        yield from (hits, misses, evictions, size, ratio)
+
+_collector = None
+
+def setup_metrics(app, pool_stats, caches: dict):
+    """Install the middleware and the pool/cache collector on app (once per process)"""
+    global _collector
+    app.add_middleware(MetricsMiddleware)
+    if _collector is None:
+        _collector = _StatsCollector(pool_stats, caches)
+        REGISTRY.register(_collector)
+
+def render_metrics():
+    """(body, content type) for the /metrics endpoint"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, Time, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Date, DateTime, Time, JSON, Index
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -9,16 +9,18 @@ class Meal(Base):
     name = Column(String, nullable=False)
     station = Column(String)
     serving_time = Column(String)
-    date_available = Column(Date)
+    date_available = Column(Date, index=True)
     price = Column(Float)
     tags = Column(JSON)  # e.g., ["vegan", "halal"]
+    content_hash = Column(String(64))  # set by menu_ingest to skip unchanged rows on re-scrape
+    removed = Column(Boolean, nullable=False, default=False)  # dropped from its day's menu but kept for history
     nutrients = relationship("Nutrient", back_populates="meal", cascade="all, delete-orphan")
     allergens = relationship("Allergen", back_populates="meal", cascade="all, delete-orphan")
 
 class Nutrient(Base):
     __tablename__ = 'nutrients'
     id = Column(Integer, primary_key=True)
-    meal_id = Column(Integer, ForeignKey('meals.id'))
+    meal_id = Column(Integer, ForeignKey('meals.id'), index=True)
     calories = Column(Float)
     protein = Column(Float)
     carbs = Column(Float)
@@ -31,7 +33,7 @@ class Nutrient(Base):
 class Allergen(Base):
     __tablename__ = 'allergens'
     id = Column(Integer, primary_key=True)
-    meal_id = Column(Integer, ForeignKey('meals.id'))
+    meal_id = Column(Integer, ForeignKey('meals.id'), index=True)
     peanuts = Column(Boolean)
     gluten = Column(Boolean)
     dairy = Column(Boolean)
@@ -57,7 +59,7 @@ class User(Base):
 class UserPreferences(Base):
     __tablename__ = 'user_preferences'
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
     allergies = Column(JSON)  # e.g., ["peanuts", "gluten"]
     dietary_tags = Column(JSON)  # e.g., ["vegetarian"]
     nutrition_goals = Column(JSON)  # e.g., {"min_protein": 30, "max_sodium": 1000}
@@ -67,6 +69,7 @@ class UserPreferences(Base):
 
 class Favorite(Base):
     __tablename__ = 'favorites'
+    __table_args__ = (Index('uq_favorites_user_meal', 'user_id', 'meal_id', unique=True),)
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     meal_id = Column(Integer, ForeignKey('meals.id'))
@@ -76,9 +79,88 @@ class Favorite(Base):
 
 class IntakeTracking(Base):
     __tablename__ = 'intake_tracking'
+    __table_args__ = (Index('ix_intake_tracking_user_date', 'user_id', 'date'),)
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     meal_id = Column(Integer, ForeignKey('meals.id'))
     date = Column(Date)
     user = relationship("User", back_populates="intake")
-    meal = relationship("Meal") 
\ No newline at end of file
+    meal = relationship("Meal")
+
+class IntakeBatch(Base):
+    """Stored outcome of POST /users/{id}/intake/batch, so a retried request with the same key replays it"""
+    __tablename__ = 'intake_batches'
+    __table_args__ = (Index('uq_intake_batches_user_key', 'user_id', 'idempotency_key', unique=True),)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    idempotency_key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # a reused key with a different body is rejected
+    response = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+class MealNeighbor(Base):
+    """Top-N similar dishes per dish from favorites and intake, rebuilt offline by recommendations.py"""
+    __tablename__ = 'meal_neighbors'
+    __table_args__ = (Index('ix_meal_neighbors_dish', 'name', 'station'),)
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    station = Column(String, nullable=False, default='')  # '' for meals without a station
+    neighbor_name = Column(String, nullable=False)
+    neighbor_station = Column(String, nullable=False, default='')
+    score = Column(Float, nullable=False)
+
+class DailyIntakeTotal(Base):
+    """Per-user, per-day rollup of intake_tracking maintained by intake_totals.py"""
+    __tablename__ = 'daily_intake_totals'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    date = Column(Date, primary_key=True)
+    meals_logged = Column(Integer, nullable=False, default=0)
+    calories = Column(Float, nullable=False, default=0.0)
+    protein = Column(Float, nullable=False, default=0.0)
+    carbs = Column(Float, nullable=False, default=0.0)
+    fat = Column(Float, nullable=False, default=0.0)
+    sodium = Column(Float, nullable=False, default=0.0)
+    sugar = Column(Float, nullable=False, default=0.0)
+    fiber = Column(Float, nullable=False, default=0.0)
+    spent = Column(Float, nullable=False, default=0.0)
+
+class ScrapeCheckpoint(Base):
+    """Last known state of one scraped page, used to skip unchanged pages and resume failed runs"""
+    __tablename__ = 'scrape_checkpoints'
+    __table_args__ = (Index('uq_scrape_checkpoints_date_url', 'date', 'page_url', unique=True),)
+    id = Column(Integer, primary_key=True)
+    date = Column(Date, nullable=False)
+    station = Column(String)
+    page_url = Column(String, nullable=False)
+    content_hash = Column(String(64))
+    etag = Column(String)
+    last_modified = Column(String)
+    items = Column(JSON)  # parsed menu items, reused when the page is unchanged
+    run_id = Column(String(32))
+    complete = Column(Boolean, nullable=False, default=False)
+    fetched_at = Column(DateTime)
+
+class ScrapeJobRecord(Base):
+    """Status and progress of one admin scrape job, shared by every worker through scrape_jobs.py"""
+    __tablename__ = 'scrape_jobs'
+    __table_args__ = (Index('uq_scrape_jobs_active', 'active', unique=True),)
+    id = Column(String(32), primary_key=True)
+    status = Column(String(16), nullable=False)
+    active = Column(Integer)  # 1 while queued or running, NULL afterwards: at most one active job
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    progress_done = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer)
+    message = Column(String)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    result = Column(JSON)
+    error = Column(String)
+
+class MenuState(Base):
+    """Single row holding the menu version; ingest_menu replaces it in the same transaction as its writes"""
+    __tablename__ = 'menu_state'
+    id = Column(Integer, primary_key=True)
+    version = Column(String(32), nullable=False)
+    updated_at = Column(DateTime)
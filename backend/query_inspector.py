@@ -0,0 +1,159 @@
+"""Per-request SQL inspection for development and staging: N+1 and slow-query detection.
+
+Opt in with QUERY_INSPECTOR=1. Every statement issued while a request is
+being served is recorded with its normalized shape (literals, bound values
+and IN-lists collapsed) and duration. When the request finishes:
+  * shapes issued QUERY_INSPECTOR_REPEAT times or more are flagged as N+1
+  * statements slower than QUERY_INSPECTOR_SLOW_MS are flagged as slow
+Every response gets X-Query-Count / X-Query-Time-Ms headers, flagged
+requests also get an X-Query-Report header and a structured JSON log line.
+
+The same recorder backs query_budget(), which tests use (via the
+query_budget fixture in conftest.py) to fail when an endpoint goes over
+its statement budget.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("QUERY_INSPECTOR", "").lower() in ("1", "true", "yes", "on")
+REPEAT_THRESHOLD = int(os.getenv("QUERY_INSPECTOR_REPEAT", "5"))
+SLOW_MS = float(os.getenv("QUERY_INSPECTOR_SLOW_MS", "100"))
+
+_literal = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_placeholder = re.compile(r"%\(\w+\)s|%s|\$\d+|:\w+|\?")
+_in_list = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_space = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """Statement with values, placeholders and IN-lists collapsed, so repeats compare equal"""
+    shape = _placeholder.sub("?", _literal.sub("?", statement))
+    shape = _in_list.sub("IN (?)", shape)
+    return _space.sub(" ", shape).strip()
+
+class QueryLog:
+    """Statements recorded during one request or test block"""
+
+    def __init__(self):
+        self.queries = []  # (shape, seconds)
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def total_ms(self) -> float:
+        return 1000 * sum(seconds for _, seconds in self.queries)
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD) -> list:
+        counts = Counter(shape for shape, _ in self.queries)
+        return [{"count": n, "statement": shape} for shape, n in counts.most_common() if n >= threshold]
+
+    def slow(self, limit_ms: float = SLOW_MS) -> list:
+        return [
+            {"ms": round(1000 * seconds, 2), "statement": shape}
+            for shape, seconds in self.queries if 1000 * seconds >= limit_ms
+        ]
+
+    def report(self) -> dict:
+        return {
+            "queries": len(self),
+            "total_ms": round(self.total_ms, 2),
+            "repeated": self.repeated(),
+            "slow": self.slow(),
+        }
+
+_current = contextvars.ContextVar("query_inspector_log", default=None)
+_instrumented = set()
+
+def attach_query_log(sync_engine):
+    """Record statements on an engine (pass async_engine.sync_engine for async ones); idempotent"""
+    if id(sync_engine) in _instrumented:
+        return
+    _instrumented.add(id(sync_engine))
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("inspector_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        log = _current.get()
+        starts = conn.info.get("inspector_query_start")
+        if log is not None and starts:
+            log.queries.append((statement_shape(statement), time.perf_counter() - starts.pop()))
+
+@contextmanager
+def capture_queries():
+    """Record every statement issued inside the block (engines must be instrumented)"""
+    log = QueryLog()
+    token = _current.set(log)
+    try:
+        yield log
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: int = None):
+    """Fail with AssertionError if the block issues more than max_queries statements,
+    or (when max_repeats is given) repeats one statement shape more than max_repeats times
+    """
+    with capture_queries() as log:
+        yield log
+    problems = []
+    if len(log) > max_queries:
+        problems.append(f"{len(log)} statements issued, budget is {max_queries}")
+    if max_repeats is not None:
+        problems += [f"{r['count']}x {r['statement']}" for r in log.repeated(max_repeats + 1)]
+    if problems:
+        raise AssertionError("Query budget exceeded:\n  " + "\n  ".join(problems))
+
+class QueryInspectorMiddleware:
+    """ASGI middleware attaching a per-request query report (see module docstring)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        log = QueryLog()
+        token = _current.set(log)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                report = log.report()
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(report["queries"]).encode()))
+                headers.append((b"x-query-time-ms", str(report["total_ms"]).encode()))
+                if report["repeated"] or report["slow"]:
+                    summary = {"repeated": [r["count"] for r in report["repeated"]], "slow_ms": [s["ms"] for s in report["slow"]]}
+                    headers.append((b"x-query-report", json.dumps(summary, separators=(",", ":")).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            report = log.report()
+            if report["repeated"] or report["slow"]:
+                route = getattr(scope.get("route"), "path", scope["path"])
+                logger.warning(json.dumps({"event": "query_inspector", "method": scope["method"], "route": route, **report}))
+
+def setup_query_inspector(app, engines):
+    """Install the middleware and statement hooks when QUERY_INSPECTOR is on"""
+    if not ENABLED:
+        return
+    for engine in engines:
+        attach_query_log(engine)
+    app.add_middleware(QueryInspectorMiddleware)
@@ -0,0 +1,174 @@
+"""Item-item collaborative filtering over favorites and intake history.
+
+Menus repeat the same dishes under a new meal id every day, so items here
+are dishes, keyed (name, station), which is also what makes yesterday's
+signal usable on today's menu.
+
+build() is the offline job (python recommendations.py build):
+  1. two grouped queries give (user, dish, count) for favorites and intake;
+     a favorite weighs FAVORITE_WEIGHT, intake log1p(times logged), packed
+     into a sparse users x dishes CSR matrix
+  2. columns are L2-normalized so X^T X is the cosine similarity; dishes are
+     split into chunks and worker processes each compute their chunk's row
+     of similarities against every dish, keeping the top N
+  3. meal_neighbors is replaced in one transaction
+
+recommend() serves a user from that table: their own dishes (one grouped
+query per source, so O(favorites + distinct dishes logged)), one indexed
+lookup of those dishes' neighbours, and the requested date's menu minus the
+user's allergies, matched against the neighbours.
+"""
+import math
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+import numpy as np
+from scipy import sparse
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from api_meals import meal_rows_query
+from database import SessionLocal
+from models import Favorite, IntakeTracking, Meal, MealNeighbor
+from user_filters import load_user_filter
+
+FAVORITE_WEIGHT = 3.0
+TOP_N = 20
+MIN_SIMILARITY = 0.01
+CHUNK_SIZE = 512
+
+_station = func.coalesce(Meal.station, "")
+
+def _interactions(model, user_id=None):
+    """(user_id, name, station, count) per dish for one interaction table"""
+    query = (
+        select(model.user_id, Meal.name, _station, func.count())
+        .join(Meal, Meal.id == model.meal_id)
+        .where(model.user_id.is_not(None))
+        .group_by(model.user_id, Meal.name, _station)
+    )
+    if user_id is not None:
+        query = query.where(model.user_id == user_id)
+    return query
+
+def _weights(db: Session, user_id=None) -> dict:
+    """{(user_id, dish): weight} from favorites and intake"""
+    weights = defaultdict(float)
+    for uid, name, station, _ in db.execute(_interactions(Favorite, user_id)):
+        weights[(uid, (name, station))] += FAVORITE_WEIGHT
+    for uid, name, station, count in db.execute(_interactions(IntakeTracking, user_id)):
+        weights[(uid, (name, station))] += math.log1p(count)
+    return weights
+
+def interaction_matrix(db: Session):
+    """(CSR users x dishes matrix, dish keys in column order)"""
+    weights = _weights(db)
+    users, dishes = {}, {}
+    rows, cols, values = [], [], []
+    for (uid, dish), weight in weights.items():
+        rows.append(users.setdefault(uid, len(users)))
+        cols.append(dishes.setdefault(dish, len(dishes)))
+        values.append(weight)
+    matrix = sparse.csr_matrix((values, (rows, cols)), shape=(len(users), len(dishes)), dtype=np.float64)
+    return matrix, list(dishes)
+
+_shared = None
+
+def _init_worker(normalized):
+    global _shared
+    _shared = normalized
+
+def _chunk_neighbors(start: int, stop: int, top_n: int) -> list:
+    """[(dish, neighbour, similarity)] column indexes for dishes start..stop-1"""
+    block = (_shared[:, start:stop].T @ _shared).toarray()
+    block[np.arange(stop - start), np.arange(start, stop)] = 0.0  # a dish is not its own neighbour
+    k = min(top_n, block.shape[1] - 1)
+    if k <= 0:
+        return []
+    top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    pairs = []
+    for offset, row in enumerate(top):
+        for j in row[np.argsort(-block[offset, row])]:
+            if block[offset, j] >= MIN_SIMILARITY:
+                pairs.append((start + offset, int(j), float(block[offset, j])))
+    return pairs
+
+def item_neighbors(matrix, top_n: int = TOP_N, workers: int = None, chunk_size: int = CHUNK_SIZE) -> list:
+    """Top-N cosine neighbours of every column, computed chunk by chunk across processes"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0))).ravel()
+    norms[norms == 0] = 1.0
+    normalized = sparse.csc_matrix(matrix @ sparse.diags(1.0 / norms))
+    chunks = [(start, min(start + chunk_size, matrix.shape[1]), top_n) for start in range(0, matrix.shape[1], chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) == 1:
+        _init_worker(normalized)
+        return [pair for chunk in chunks for pair in _chunk_neighbors(*chunk)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(normalized,)) as pool:
+        results = pool.map(_chunk_neighbors, *zip(*chunks))
+        return [pair for chunk in results for pair in chunk]
+
+def build(db: Session, top_n: int = TOP_N, workers: int = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """Recompute meal_neighbors from scratch; returns the number of rows written"""
+    matrix, dishes = interaction_matrix(db)
+    pairs = item_neighbors(matrix, top_n, workers, chunk_size) if dishes else []
+    db.execute(delete(MealNeighbor))
+    rows = [
+        {"name": dishes[i][0], "station": dishes[i][1],
+         "neighbor_name": dishes[j][0], "neighbor_station": dishes[j][1], "score": score}
+        for i, j, score in pairs
+    ]
+    for start in range(0, len(rows), 5000):
+        db.execute(insert(MealNeighbor), rows[start:start + 5000])
+    db.commit()
+    return len(rows)
+
+def recommend(db: Session, user_id: int, date, limit: int = 10) -> list:
+    """[(meal row, score)] on date for a user, best first; empty before the first build()"""
+    own = {dish: weight for (_, dish), weight in _weights(db, user_id).items()}
+    if not own:
+        return []
+    scores = defaultdict(float)
+    neighbors = db.execute(
+        select(MealNeighbor.name, MealNeighbor.station, MealNeighbor.neighbor_name,
+               MealNeighbor.neighbor_station, MealNeighbor.score)
+        .where(tuple_(MealNeighbor.name, MealNeighbor.station).in_(list(own)))
+    )
+    for name, station, neighbor_name, neighbor_station, score in neighbors:
+        neighbor = (neighbor_name, neighbor_station)
+        if neighbor not in own:
+            scores[neighbor] += own[(name, station)] * score
+    if not scores:
+        return []
+
+    # A day's menu is a few dozen rows, cheaper to match here than with a long (name, station) IN
+    query = meal_rows_query().where(Meal.date_available == date, *load_user_filter(db, user_id).allergen_conditions())
+    best = {}
+    for row in db.execute(query.order_by(Meal.id)):
+        _, name, station = row[:3]
+        if (name, station or "") in scores:
+            best.setdefault((name, station or ""), row)  # one meal per dish
+    ranked = sorted(best.items(), key=lambda item: (-scores[item[0]], item[1][0]))
+    return [(row, round(scores[dish], 4)) for dish, row in ranked[:limit]]
+
+@click.group()
+def cli():
+    pass
+
+@cli.command("build")
+@click.option("--top-n", default=TOP_N, help="Neighbours kept per dish")
+@click.option("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+@click.option("--chunk-size", default=CHUNK_SIZE, help="Dishes per worker task")
+def build_command(top_n, workers, chunk_size):
+    db = SessionLocal()
+    t0 = time.perf_counter()
+    try:
+        count = build(db, top_n, workers, chunk_size)
+    finally:
+        db.close()
+    click.echo(f"Stored {count} meal neighbours in {time.perf_counter() - t0:.1f}s")
+
+if __name__ == "__main__":
+    cli()
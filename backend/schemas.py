@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+from pydantic import BaseModel, Field
+from typing import Any, List, Optional, Dict
 import datetime
 
 class NutrientSchema(BaseModel):
@@ -38,6 +38,44 @@ class MealSchema(BaseModel):
 
 class MealListResponse(BaseModel):
     meals: List[MealSchema]
+    next_cursor: Optional[str] = None
+
+class MealSearchResult(MealSchema):
+    score: float
+
+class MealSearchResponse(BaseModel):
+    query: str
+    results: List[MealSearchResult]
+
+class SimilarMeal(MealSchema):
+    distance: float
+
+class SimilarMealsResponse(BaseModel):
+    meal_id: int
+    date: datetime.date
+    results: List[SimilarMeal]
+
+class MealFilters(BaseModel):
+    station: Optional[str] = None
+    serving_time: Optional[str] = None
+    tag: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    min_calories: Optional[float] = None
+    max_calories: Optional[float] = None
+    min_protein: Optional[float] = None
+    max_protein: Optional[float] = None
+    min_carbs: Optional[float] = None
+    max_carbs: Optional[float] = None
+    min_fat: Optional[float] = None
+    max_fat: Optional[float] = None
+    min_sodium: Optional[float] = None
+    max_sodium: Optional[float] = None
+    min_sugar: Optional[float] = None
+    max_sugar: Optional[float] = None
+    min_fiber: Optional[float] = None
+    max_fiber: Optional[float] = None
+    exclude_allergens: Optional[str] = None  # comma separated, e.g. "peanuts,gluten"
 
 class UserPreferencesSchema(BaseModel):
     allergies: Optional[List[str]]
@@ -57,12 +95,41 @@ class FavoriteSchema(BaseModel):
         from_attributes = True
 
 class IntakeTrackingSchema(BaseModel):
+    id: Optional[int] = None
     meal_id: int
     date: Optional[datetime.date]
 
     class Config:
         from_attributes = True
 
+class IntakeBatchEntry(BaseModel):
+    meal_id: int
+    date: Optional[datetime.date] = None
+
+class IntakeBatchRequest(BaseModel):
+    entries: List[IntakeBatchEntry] = Field(..., min_length=1, max_length=1000)
+
+class IntakeBatchItemResult(BaseModel):
+    index: int
+    meal_id: int
+    date: Optional[datetime.date] = None
+    status: str  # "created" or "error"
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class IntakeBatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[IntakeBatchItemResult]
+
+class RecommendedMeal(MealSchema):
+    score: float
+
+class RecommendationsResponse(BaseModel):
+    user_id: int
+    date: datetime.date
+    results: List[RecommendedMeal]
+
 class UserSchema(BaseModel):
     id: int
     email: str
@@ -71,4 +138,56 @@ class UserSchema(BaseModel):
     preferences: Optional[UserPreferencesSchema]
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class GoalProgressSchema(BaseModel):
+    goal: str
+    target: float
+    actual: float
+    met: bool
+
+class IntakeSummaryPeriodSchema(BaseModel):
+    period_start: datetime.date
+    days: int
+    meals_logged: int
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+    sodium: float
+    sugar: float
+    fiber: float
+    spent: float
+    budget: Optional[float] = None
+    within_budget: Optional[bool] = None
+    goals: List[GoalProgressSchema] = []
+
+class IntakeSummaryResponse(BaseModel):
+    user_id: int
+    from_date: datetime.date
+    to_date: datetime.date
+    granularity: str
+    periods: List[IntakeSummaryPeriodSchema]
+
+class MealPlanResponse(BaseModel):
+    user_id: int
+    date: datetime.date
+    meals: List[MealSchema]
+    feasible: bool
+    optimal: bool
+    total_price: float
+    totals: NutrientSchema
+    goals: List[GoalProgressSchema] = []
+
+class ScrapeJobSchema(BaseModel):
+    job_id: str
+    status: str
+    created_at: datetime.datetime
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+    progress_done: int = 0
+    progress_total: Optional[int] = None
+    message: Optional[str] = None
+    cancel_requested: bool = False
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
@@ -0,0 +1,79 @@
+"""Per-page scrape checkpoints.
+
+One row per (menu date, page URL) remembers the page's content hash, its
+ETag/Last-Modified validators and the items parsed from it. A scrape run
+marks every page of the day incomplete when it starts and completes each
+page as soon as it is processed (committed immediately), so:
+
+  * a run that dies halfway leaves incomplete rows behind, and the next run
+    resumes it, skipping pages that run already finished
+  * a fresh run sends conditional GETs and reuses the stored items for pages
+    that answer 304 or whose body hash did not change
+"""
+import datetime
+import uuid
+from sqlalchemy.orm import Session
+from fields import as_date
+from models import ScrapeCheckpoint
+
+class CheckpointStore:
+    def __init__(self, db: Session):
+        self.db = db
+        self.run_id = None
+
+    def begin(self, date, pages) -> set:
+        """Start or resume the run for date; returns URLs already completed by a resumed run"""
+        date = as_date(date)
+        rows = {cp.page_url: cp for cp in self.db.query(ScrapeCheckpoint).filter(ScrapeCheckpoint.date == date)}
+        interrupted = [cp for cp in rows.values() if not cp.complete and cp.run_id]
+        if interrupted:
+            self.run_id = interrupted[0].run_id
+            done = {url for url, cp in rows.items() if cp.complete and cp.run_id == self.run_id}
+        else:
+            self.run_id = uuid.uuid4().hex
+            done = set()
+        for page in pages:
+            cp = rows.get(page["url"])
+            if cp is None:
+                cp = ScrapeCheckpoint(date=date, page_url=page["url"], station=page.get("station"))
+                self.db.add(cp)
+            if page["url"] not in done:
+                cp.complete = False
+                cp.run_id = self.run_id
+        self.db.commit()
+        return done
+
+    def get(self, date, url):
+        return (
+            self.db.query(ScrapeCheckpoint)
+            .filter(ScrapeCheckpoint.date == as_date(date), ScrapeCheckpoint.page_url == url)
+            .first()
+        )
+
+    def conditional_headers(self, date, url) -> dict:
+        cp = self.get(date, url)
+        headers = {}
+        # Validators are only trusted while we still hold the items they describe
+        if cp is not None and cp.items is not None:
+            if cp.etag:
+                headers["If-None-Match"] = cp.etag
+            if cp.last_modified:
+                headers["If-Modified-Since"] = cp.last_modified
+        return headers
+
+    def record(self, date, url, items, content_hash=None, etag=None, last_modified=None, complete=True):
+        """Store a processed page and commit, so it survives a crash later in the run"""
+        cp = self.get(date, url)
+        if content_hash is not None:
+            cp.content_hash = content_hash
+        if etag is not None:
+            cp.etag = etag
+        if last_modified is not None:
+            cp.last_modified = last_modified
+        if items is not None:
+            cp.items = items
+        cp.run_id = self.run_id
+        cp.complete = complete
+        cp.fetched_at = datetime.datetime.utcnow()
+        self.db.commit()
+        return cp
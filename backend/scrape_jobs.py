@@ -0,0 +1,233 @@
+"""Background runner for scrape jobs, with job state kept in the database.
+
+Scrapes run on a daemon worker thread with their own DB session, so the
+admin request returns immediately with a job id instead of holding a
+request worker (and a proxy connection) open for minutes.
+
+Job status, progress and the cancel flag live in the scrape_jobs table, so
+every uvicorn worker sees the same jobs. Single-flight is a unique index on
+scrape_jobs.active, which is 1 while a job is queued or running and NULL
+afterwards: submitting while any worker has an active job returns that job.
+The job runs in the worker that created it; a job whose worker died stops
+heartbeating and is failed after SCRAPE_JOB_STALE_AFTER seconds, which frees
+the slot. Cancellation is cooperative: queued jobs are dropped at once,
+running jobs stop at the next job.check_cancelled() the scraper reaches.
+"""
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal
+from metrics import SCRAPE_JOBS
+from models import ScrapeJobRecord
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+# Progress is written and the cancel flag polled at most this often per job
+SYNC_INTERVAL = float(os.getenv("SCRAPE_JOB_SYNC_INTERVAL", "1.0"))
+STALE_AFTER = float(os.getenv("SCRAPE_JOB_STALE_AFTER", "1800"))
+
+class JobCancelled(Exception):
+    pass
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+def job_to_dict(record: ScrapeJobRecord) -> dict:
+    return {
+        "job_id": record.id,
+        "status": record.status,
+        "created_at": record.created_at,
+        "started_at": record.started_at,
+        "finished_at": record.finished_at,
+        "progress_done": record.progress_done,
+        "progress_total": record.progress_total,
+        "message": record.message,
+        "cancel_requested": record.cancel_requested,
+        "result": record.result,
+        "error": record.error,
+    }
+
+class ScrapeJob:
+    """Handle passed to the scrape target; mirrors progress and cancellation to the job's row"""
+
+    def __init__(self, job_id: str, session_factory=SessionLocal):
+        self.id = job_id
+        self.session_factory = session_factory
+        self.progress_done = 0
+        self.progress_total = None
+        self.message = None
+        self._cancelled = False
+        self._synced_at = 0.0
+
+    def report(self, done: int, total=None, message=None):
+        """Progress hook for scrapers: pages/stations done out of total"""
+        self.progress_done = done
+        if total is not None:
+            self.progress_total = total
+        if message is not None:
+            self.message = message
+        self._sync(force=total is not None or message is not None)
+
+    @property
+    def cancel_requested(self) -> bool:
+        self._sync()
+        return self._cancelled
+
+    def check_cancelled(self):
+        """Scrapers call this between units of work to honour cancellation"""
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def _sync(self, force: bool = False):
+        """Write progress and a heartbeat, and read the cancel flag another worker may have set"""
+        now = time.monotonic()
+        if not force and now - self._synced_at < SYNC_INTERVAL:
+            return
+        self._synced_at = now
+        with self.session_factory() as db:
+            db.execute(update(ScrapeJobRecord).where(ScrapeJobRecord.id == self.id).values(
+                progress_done=self.progress_done, progress_total=self.progress_total,
+                message=self.message, heartbeat_at=_now(),
+            ))
+            self._cancelled = bool(db.scalar(select(ScrapeJobRecord.cancel_requested).where(ScrapeJobRecord.id == self.id)))
+            db.commit()
+
+class ScrapeJobRunner:
+    def __init__(self, target, history: int = 50, session_factory=SessionLocal):
+        """target(job, db) does the scrape and returns a JSON-able result"""
+        self.target = target
+        self.history = history
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def submit(self):
+        """Queue a scrape; returns (job dict, created) where created is False if one was already active"""
+        with self.session_factory() as db:
+            self._fail_stale(db)
+            now = _now()
+            record = ScrapeJobRecord(
+                id=uuid.uuid4().hex, status=QUEUED, active=1, created_at=now, heartbeat_at=now,
+                progress_done=0, cancel_requested=False,
+            )
+            db.add(record)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another request or worker holds the active slot
+                db.rollback()
+                current = db.scalar(select(ScrapeJobRecord).where(ScrapeJobRecord.active == 1))
+                if current is None:
+                    raise
+                return job_to_dict(current), False
+            self._prune(db)
+            job = job_to_dict(record)
+        with self._lock:
+            self._ensure_worker()
+        self._queue.put(job["job_id"])
+        return job, True
+
+    def get(self, job_id: str):
+        with self.session_factory() as db:
+            record = db.get(ScrapeJobRecord, job_id)
+            return job_to_dict(record) if record else None
+
+    def cancel(self, job_id: str):
+        with self.session_factory() as db:
+            record = db.get(ScrapeJobRecord, job_id)
+            if record is None:
+                return None
+            if record.status in ACTIVE:
+                record.cancel_requested = True
+                if record.status == QUEUED:
+                    record.status = CANCELLED
+                    record.active = None
+                    record.finished_at = _now()
+                db.commit()
+            return job_to_dict(record)
+
+    def _fail_stale(self, db):
+        """Free the active slot of a job whose worker stopped heartbeating (e.g. it was restarted)"""
+        cutoff = _now() - datetime.timedelta(seconds=STALE_AFTER)
+        result = db.execute(
+            update(ScrapeJobRecord)
+            .where(ScrapeJobRecord.active == 1, ScrapeJobRecord.heartbeat_at < cutoff)
+            .values(status=FAILED, active=None, finished_at=_now(), error="Worker stopped reporting")
+        )
+        if result.rowcount:
+            logger.warning("Marked a stale scrape job as failed")
+        db.commit()
+
+    def _prune(self, db):
+        """Keep only the newest `history` jobs"""
+        keep = select(ScrapeJobRecord.id).order_by(ScrapeJobRecord.created_at.desc()).limit(self.history)
+        db.execute(delete(ScrapeJobRecord).where(ScrapeJobRecord.active.is_(None), ScrapeJobRecord.id.not_in(keep)))
+        db.commit()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._loop, name="scrape-jobs", daemon=True)
+            self._worker.start()
+
+    def _loop(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id: str):
+        started_at = _now()
+        with self.session_factory() as db:
+            claimed = db.execute(
+                update(ScrapeJobRecord)
+                .where(ScrapeJobRecord.id == job_id, ScrapeJobRecord.status == QUEUED)
+                .values(status=RUNNING, started_at=started_at, heartbeat_at=started_at)
+            ).rowcount
+            db.commit()
+        if not claimed:
+            # Cancelled while queued
+            return
+        job = ScrapeJob(job_id, self.session_factory)
+        db = self.session_factory()
+        status, result, error = FAILED, None, None
+        try:
+            job.check_cancelled()
+            result = self.target(job, db)
+            status = SUCCEEDED
+        except JobCancelled:
+            db.rollback()
+            status = CANCELLED
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Scrape job {job_id} failed: {str(e)}")
+            error = str(e)
+        finally:
+            db.close()
+            finished_at = _now()
+            with self.session_factory() as db:
+                db.execute(update(ScrapeJobRecord).where(ScrapeJobRecord.id == job_id).values(
+                    status=status, active=None, finished_at=finished_at, result=result, error=error,
+                    progress_done=job.progress_done, progress_total=job.progress_total, message=job.message,
+                ))
+                db.commit()
+            SCRAPE_JOBS.labels(status).observe((finished_at - started_at).total_seconds())
+
+    def wait(self):
+        """Block until this worker's queue is drained (used by scripts and tests)"""
+        self._queue.join()
@@ -0,0 +1,218 @@
+"""Synthetic data generator for load tests and benchmarks.
+
+Fills a database with realistic-looking McMaster dining data at any scale:
+a dish catalog shared across stations, daily menus drawn from it (so the
+same dish recurs on many days, like the real site), nutrients that add up
+(calories ~ 4p + 4c + 9f), allergens and tags consistent with the dish,
+users with preferences, Zipf-skewed favorites and a per-user intake history
+with the daily rollup rebuilt at the end. Everything is driven by --seed
+and every date is counted back from --end-date (a fixed default, not
+today), so the same arguments always produce the same database.
+
+    python seed_data.py --users 50000 --days 730 --url postgresql://localhost/bench
+    python seed_data.py --users 1000 --days 60 --url sqlite:///./bench.db --reset
+"""
+import datetime
+import itertools
+import random
+import time
+
+import click
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from database import DATABASE_URL, make_engine
+from fields import ALLERGEN_FIELDS
+from intake_totals import rebuild
+from menu_ingest import content_hash
+from models import Allergen, Base, Favorite, IntakeTracking, Meal, Nutrient, User, UserPreferences
+
+STATIONS = {
+    "Bistro 2 Go": ("Breakfast", "Lunch"),
+    "McMaster Dining": ("Lunch", "Dinner"),
+    "East Meets West": ("Lunch", "Dinner"),
+    "Centro": ("Breakfast", "Lunch", "Dinner"),
+    "Williams Fresh Cafe": ("Breakfast", "Lunch"),
+    "La Piazza": ("Lunch", "Dinner"),
+}
+# (base dish, protein grams, carb grams, fat grams, allergens it always has, tags)
+BASES = [
+    ("Smash Burger", 32, 40, 28, {"gluten", "dairy", "sesame"}, []),
+    ("Chicken Shawarma Bowl", 38, 55, 18, set(), ["Halal"]),
+    ("Falafel Wrap", 14, 62, 20, {"gluten", "sesame"}, ["Vegan"]),
+    ("Pad Thai", 22, 70, 16, {"peanuts", "egg", "soy", "fish"}, []),
+    ("Butter Chicken", 34, 48, 26, {"dairy"}, ["Halal"]),
+    ("Tofu Stir Fry", 20, 52, 14, {"soy"}, ["Vegan", "Vegetarian"]),
+    ("Margherita Pizza", 18, 66, 22, {"gluten", "dairy"}, ["Vegetarian"]),
+    ("Caesar Salad", 12, 18, 24, {"dairy", "egg", "fish", "gluten"}, []),
+    ("Salmon Poke Bowl", 30, 58, 15, {"fish", "soy", "sesame"}, ["Gluten Free"]),
+    ("Lentil Soup", 16, 40, 6, set(), ["Vegan", "Gluten Free"]),
+    ("Breakfast Sandwich", 21, 34, 19, {"gluten", "egg", "dairy"}, []),
+    ("Oatmeal Bar", 8, 54, 7, {"tree_nuts"}, ["Vegetarian"]),
+    ("Beef Pho", 28, 60, 9, {"fish"}, ["Gluten Free"]),
+    ("Mac and Cheese", 20, 64, 30, {"gluten", "dairy"}, ["Vegetarian"]),
+    ("Shrimp Tacos", 24, 44, 17, {"shellfish", "gluten"}, []),
+    ("Chana Masala", 15, 58, 12, set(), ["Vegan", "Halal", "Gluten Free"]),
+]
+STYLES = ["", "Spicy ", "Grilled ", "Classic ", "Loaded ", "Mini ", "Double ", "Harvest ", "Korean "]
+SIDES = ["", " with Fries", " with Rice", " with Greens", " Combo"]
+GOALS = ["min_protein", "max_calories", "max_sodium", "min_fiber", "max_sugar", "max_fat"]
+GOAL_RANGES = {
+    "min_protein": (60, 160), "max_calories": (1600, 3000), "max_sodium": (1500, 2600),
+    "min_fiber": (20, 40), "max_sugar": (30, 70), "max_fat": (50, 90),
+}
+BATCH = 5000
+DEFAULT_END_DATE = "2024-04-30"
+
+def make_catalog(rng, size):
+    """Unique dishes with stable nutrients, allergens, tags and a base price"""
+    names = [f"{style}{base[0]}{side}" for base in BASES for style in STYLES for side in SIDES]
+    rng.shuffle(names)
+    by_name = {b[0]: b for b in BASES}
+    catalog = []
+    for name in names[:size]:
+        base = next(b for n, b in by_name.items() if n in name)
+        _, protein, carbs, fat, allergens, tags = base
+        scale = rng.uniform(0.7, 1.4) * (0.6 if name.startswith("Mini") else 1.6 if name.startswith("Double") else 1.0)
+        p, c, f = protein * scale, carbs * scale, fat * scale
+        catalog.append({
+            "name": name,
+            "station": rng.choice(list(STATIONS)),
+            "price": round(rng.uniform(4.5, 9.0) + scale * 3 + (1.5 if " Combo" in name else 0), 2),
+            "tags": list(tags) + (["Spicy"] if name.startswith("Spicy") else []),
+            "nutrients": {
+                "calories": round(4 * p + 4 * c + 9 * f + rng.uniform(-30, 30), 1),
+                "protein": round(p, 1), "carbs": round(c, 1), "fat": round(f, 1),
+                "sodium": round(rng.uniform(300, 1400) * scale, 1),
+                "sugar": round(c * rng.uniform(0.05, 0.3), 1),
+                "fiber": round(c * rng.uniform(0.03, 0.15), 1),
+            },
+            # Kitchens share equipment, so a few dishes pick up a cross-contact allergen
+            "allergens": {a: a in allergens or rng.random() < 0.03 for a in ALLERGEN_FIELDS},
+        })
+    return catalog
+
+def _bulk_insert(conn, model, rows, returning=None):
+    """executemany in batches; with returning, yields the generated ids in input order"""
+    ids = []
+    for start in range(0, len(rows), BATCH):
+        chunk = rows[start:start + BATCH]
+        if returning is not None:
+            result = conn.execute(insert(model).returning(returning, sort_by_parameter_order=True), chunk)
+            ids.extend(result.scalars())
+        else:
+            conn.execute(insert(model), chunk)
+    return ids
+
+def seed_menus(conn, rng, catalog, start, days, meals_per_day):
+    """One menu per day drawn from the catalog; returns {date: [meal_id, ...]}"""
+    meals, nutrients, allergens, meal_days = [], [], [], []
+    for offset in range(days):
+        day = start + datetime.timedelta(days=offset)
+        for dish in rng.sample(catalog, min(meals_per_day, len(catalog))):
+            item = {**dish, "serving_time": rng.choice(STATIONS[dish["station"]]), "date_available": day.isoformat()}
+            meals.append({
+                "name": item["name"], "station": item["station"], "serving_time": item["serving_time"],
+                "date_available": day, "price": item["price"], "tags": item["tags"],
+                "content_hash": content_hash(item),
+            })
+            nutrients.append(item["nutrients"])
+            allergens.append(item["allergens"])
+            meal_days.append(day)
+    ids = _bulk_insert(conn, Meal, meals, returning=Meal.id)
+    _bulk_insert(conn, Nutrient, [{"meal_id": i, **n} for i, n in zip(ids, nutrients)])
+    _bulk_insert(conn, Allergen, [{"meal_id": i, **a} for i, a in zip(ids, allergens)])
+    menus = {}
+    for meal_id, day in zip(ids, meal_days):
+        menus.setdefault(day, []).append(meal_id)
+    return menus
+
+def seed_users(conn, rng, users, start):
+    rows = [
+        {"email": f"student{i}@mcmaster.ca", "password_hash": "x", "name": f"Student {i}",
+         "created_at": start + datetime.timedelta(days=rng.randrange(30))}
+        for i in range(1, users + 1)
+    ]
+    ids = _bulk_insert(conn, User, rows, returning=User.id)
+    prefs = []
+    for user_id in ids:
+        if rng.random() < 0.2:
+            continue  # not everyone fills in preferences
+        goals = {g: rng.randint(*GOAL_RANGES[g]) for g in rng.sample(GOALS, rng.randint(0, 3))}
+        budget = rng.choice([None, 12, 15, 20])
+        prefs.append({
+            "user_id": user_id,
+            "allergies": rng.sample(ALLERGEN_FIELDS, rng.choice([0, 0, 0, 1, 1, 2])),
+            "dietary_tags": rng.choice([[], [], [], ["Vegetarian"], ["Vegan"], ["Halal"], ["Gluten Free"]]),
+            "nutrition_goals": goals,
+            "budget_per_meal": budget,
+            "budget_per_day": budget * 3 if budget else None,
+        })
+    _bulk_insert(conn, UserPreferences, prefs)
+    return ids
+
+def seed_activity(conn, rng, user_ids, menus, favorites_per_user, intake_days):
+    """Zipf-skewed favorites and per-user intake history over the last intake_days menu days"""
+    days = sorted(menus)
+    all_meals = list(itertools.chain.from_iterable(menus.values()))
+    # Popular meals get favorited far more often, like real usage; accumulated once, not per user
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(all_meals))))
+    popular = rng.sample(all_meals, len(all_meals))
+    favorites, intake = [], []
+    recent = days[-intake_days:]
+    for user_id in user_ids:
+        picks = set(rng.choices(popular, cum_weights=cum_weights, k=rng.randint(0, 2 * favorites_per_user)))
+        for meal_id in picks:
+            favorites.append({"user_id": user_id, "meal_id": meal_id,
+                              "date_favorited": rng.choice(days)})
+        activity = rng.uniform(0.2, 0.9)  # share of days this user logs anything
+        for day in recent:
+            if rng.random() < activity:
+                for meal_id in rng.sample(menus[day], min(rng.randint(1, 3), len(menus[day]))):
+                    intake.append({"user_id": user_id, "meal_id": meal_id, "date": day})
+        if len(intake) >= BATCH * 20:
+            _bulk_insert(conn, IntakeTracking, intake)
+            intake = []
+    _bulk_insert(conn, Favorite, favorites)
+    _bulk_insert(conn, IntakeTracking, intake)
+    return len(favorites)
+
+@click.command()
+@click.option("--url", default=DATABASE_URL, help="Target database (defaults to DATABASE_URL)")
+@click.option("--users", default=1000)
+@click.option("--days", default=60, help="Days of menus, ending on --end-date")
+@click.option("--end-date", type=click.DateTime(formats=["%Y-%m-%d"]), default=DEFAULT_END_DATE,
+              help="Last menu day; fixed so reruns on other days give the same data")
+@click.option("--meals-per-day", default=60)
+@click.option("--catalog", default=400, help="Distinct dishes menus are drawn from")
+@click.option("--favorites", default=10, help="Average favorites per user")
+@click.option("--intake-days", default=30, help="Most recent menu days with intake history")
+@click.option("--seed", default=42)
+@click.option("--reset", is_flag=True, help="Drop and recreate all tables first")
+def main(url, users, days, end_date, meals_per_day, catalog, favorites, intake_days, seed, reset):
+    engine = make_engine(url)
+    if reset:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    rng = random.Random(seed)
+    start = end_date.date() - datetime.timedelta(days=days - 1)
+
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        if conn.scalar(select(func.count()).select_from(Meal)) and not reset:
+            raise click.ClickException("Target already has meals; pass --reset to replace them")
+        menus = seed_menus(conn, rng, make_catalog(rng, catalog), start, days, meals_per_day)
+        click.echo(f"meals: {sum(map(len, menus.values()))} over {days} days ({time.perf_counter() - t0:.1f}s)")
+        user_ids = seed_users(conn, rng, users, start)
+        click.echo(f"users: {len(user_ids)} ({time.perf_counter() - t0:.1f}s)")
+        fav_count = seed_activity(conn, rng, user_ids, menus, favorites, min(intake_days, days))
+        click.echo(f"favorites: {fav_count}, intake over {min(intake_days, days)} days ({time.perf_counter() - t0:.1f}s)")
+    with Session(engine) as db:
+        click.echo(f"daily totals: {rebuild(db)} rows ({time.perf_counter() - t0:.1f}s)")
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("ANALYZE")
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""API test fixtures: a throwaway SQLite database, a TestClient and row factories.
+
+DATABASE_URL must point at the test database before database.py is imported.
+It is a file rather than :memory: because the sync and async engines would
+otherwise each see their own empty database.
+"""
+import datetime
+import itertools
+import os
+import tempfile
+
+import pytest
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='macmealmatch-tests-')}/test.db"
+
+DAY = datetime.date(2024, 1, 15)
+
+@pytest.fixture
+def db():
+    """Session on a freshly created schema, with every in-process cache emptied"""
+    from database import SessionLocal, engine
+    from menu_cache import invalidate_menu
+    from models import Base
+    from user_filters import preference_cache
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    invalidate_menu()
+    preference_cache.invalidate()
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+_names = itertools.count(1)
+
+@pytest.fixture
+def make_meals(db):
+    """make_meals(n, date=DAY) -> n new meals, each with a nutrients and an allergens row"""
+    from models import Allergen, Meal, Nutrient
+
+    def make(n: int, date: datetime.date = DAY) -> list:
+        meals = []
+        for _ in range(n):
+            i = next(_names)
+            meal = Meal(
+                name=f"Dish {i}", station=("Bistro", "Grill", "Greens")[i % 3], serving_time="Lunch",
+                date_available=date, price=4.0 + i % 7, tags=["Vegan"] if i % 3 == 0 else ["Halal"],
+            )
+            meal.nutrients = [Nutrient(calories=200.0 + i, protein=i % 40, carbs=30.0, fat=10.0, sodium=400.0, sugar=5.0, fiber=3.0)]
+            meal.allergens = [Allergen(peanuts=i % 5 == 0, gluten=i % 2 == 0, dairy=False, soy=False, egg=False,
+                                       fish=False, shellfish=False, tree_nuts=False, sesame=False)]
+            meals.append(meal)
+        db.add_all(meals)
+        db.commit()
+        return meals
+
+    return make
+
+@pytest.fixture
+def make_user(db):
+    """make_user() -> a new User"""
+    from models import User
+
+    def make():
+        i = next(_names)
+        user = User(email=f"user{i}@example.com", password_hash="x", name=f"User {i}")
+        db.add(user)
+        db.commit()
+        return user
+
+    return make
@@ -0,0 +1,68 @@
+import httpx
+import pytest
+
+from http_scraper import ScrapeError, fixture_transport, run_http_scrape
+from models import Meal
+from scrape_jobs import FAILED, ScrapeJobRunner
+
+BASE_URL = "http://dining.test"
+MAINTENANCE = "<html><body><h1>Menus are temporarily unavailable</h1></body></html>"
+EAST_MEETS_WEST = """
+<section class="station" data-station="East Meets West" data-date="2024-01-15">
+  <article class="menu-item" data-serving-time="Dinner"><h3 class="item-name">Pad Thai</h3></article>
+</section>
+"""
+
+class _Job:
+    progress_done = 0
+
+    def report(self, done, total=None, message=None):
+        self.progress_done = done
+
+    def check_cancelled(self):
+        pass
+
+def _render(urls) -> dict:
+    # Stands in for headless Chrome on the fixture's client-rendered page
+    return {url: EAST_MEETS_WEST for url in urls}
+
+def _maintenance_transport(index: bool):
+    """Fixture site whose index (or else every station page) is a 200 maintenance page"""
+    fixtures = fixture_transport()
+
+    async def handler(request: httpx.Request):
+        if index or request.url.path.rstrip("/") != "/menus":
+            return httpx.Response(200, text=MAINTENANCE, headers={"content-type": "text/html"})
+        return await fixtures.handle_async_request(request)
+
+    return httpx.MockTransport(handler)
+
+def _scrape(db, transport) -> dict:
+    return run_http_scrape(_Job(), db, base_url=BASE_URL, transport=transport, renderer=_render)
+
+def test_fixture_site_is_scraped_and_ingested_offline(db):
+    result = _scrape(db, fixture_transport())
+    assert result["pages"] == 3 and result["selenium_pages"] == 1
+    assert result["added"] == result["meals_processed"] == 6
+    names = {name for name, in db.query(Meal.name)}
+    assert {"Btg Falafel Top", "Pad Thai"} <= names
+
+    again = _scrape(db, fixture_transport())
+    assert (again["added"], again["changed"], again["removed"], again["unchanged"]) == (0, 0, 0, 6)
+
+@pytest.mark.parametrize("index", [True, False], ids=["index", "station-pages"])
+def test_maintenance_page_fails_without_touching_the_menu(db, index):
+    _scrape(db, fixture_transport())
+    with pytest.raises(ScrapeError):
+        _scrape(db, _maintenance_transport(index))
+    assert db.query(Meal).count() == 6
+
+def test_maintenance_page_fails_the_scrape_job(db):
+    runner = ScrapeJobRunner(lambda job, session: run_http_scrape(
+        job, session, base_url=BASE_URL, transport=_maintenance_transport(True), renderer=_render,
+    ))
+    job, _ = runner.submit()
+    runner.wait()
+    finished = runner.get(job["job_id"])
+    assert finished["status"] == FAILED
+    assert "No station pages" in finished["error"]
@@ -0,0 +1,71 @@
+from intake_totals import check
+from menu_ingest import ingest_menu
+from models import DailyIntakeTotal, IntakeTracking
+
+def _item(meal, calories: float) -> dict:
+    return {
+        "name": meal.name, "station": meal.station, "serving_time": meal.serving_time,
+        "date_available": meal.date_available, "price": meal.price, "tags": meal.tags,
+        "nutrients": {"calories": calories, "protein": 10.0},
+        "allergens": {"gluten": True},
+    }
+
+def test_rescrape_then_delete_keeps_the_rollup_exact(client, db, make_meals, make_user):
+    user = make_user()
+    meal, = make_meals(1)
+    response = client.post(f"/users/{user.id}/intake", json={"user_id": user.id, "meal_id": meal.id, "date": str(meal.date_available)})
+    assert response.status_code == 200
+    intake_id = response.json()["id"]
+
+    # The dining hall corrects the dish after it was logged
+    assert ingest_menu(db, [_item(meal, 300.0)])["changed"] == 1
+    db.expire_all()
+    assert check(db) == []
+    assert db.get(DailyIntakeTotal, (user.id, meal.date_available)).calories == 300.0
+
+    assert client.delete(f"/users/{user.id}/intake/{intake_id}").status_code == 200
+    db.expire_all()
+    assert check(db) == []
+    assert db.get(DailyIntakeTotal, (user.id, meal.date_available)) is None
+
+def _batch(client, user, entries, key=None):
+    headers = {"Idempotency-Key": key} if key else {}
+    return client.post(f"/users/{user.id}/intake/batch", json={"entries": entries}, headers=headers)
+
+def test_batch_reports_unknown_meals_per_entry(client, db, make_meals, make_user):
+    user = make_user()
+    meals = make_meals(2)
+    entries = [{"meal_id": meals[0].id, "date": "2024-01-15"}, {"meal_id": 999999, "date": "2024-01-15"},
+               {"meal_id": meals[1].id, "date": "2024-01-15"}]
+    response = _batch(client, user, entries)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 1)
+    assert [r["status"] for r in body["results"]] == ["created", "error", "created"]
+    assert (body["results"][1]["id"], body["results"][1]["error"]) == (None, "Meal not found")
+    db.expire_all()
+    assert check(db) == []
+    assert db.query(IntakeTracking).filter(IntakeTracking.user_id == user.id).count() == 2
+
+def test_batch_replays_a_retried_idempotency_key(client, db, make_meals, make_user):
+    user = make_user()
+    meal, = make_meals(1)
+    entries = [{"meal_id": meal.id, "date": "2024-01-15"}]
+    first = _batch(client, user, entries, key="retry-1")
+    again = _batch(client, user, entries, key="retry-1")
+    assert first.status_code == again.status_code == 200
+    assert again.headers.get("Idempotent-Replayed") == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert again.json() == first.json()
+    db.expire_all()
+    assert db.query(IntakeTracking).filter(IntakeTracking.user_id == user.id).count() == 1
+    assert db.get(DailyIntakeTotal, (user.id, meal.date_available)).meals_logged == 1
+
+def test_batch_rejects_a_reused_key_with_a_different_body(client, db, make_meals, make_user):
+    user = make_user()
+    meals = make_meals(2)
+    assert _batch(client, user, [{"meal_id": meals[0].id, "date": "2024-01-15"}], key="retry-2").status_code == 200
+    response = _batch(client, user, [{"meal_id": meals[1].id, "date": "2024-01-15"}], key="retry-2")
+    assert response.status_code == 422
+    db.expire_all()
+    assert db.query(IntakeTracking).filter(IntakeTracking.user_id == user.id).count() == 1
@@ -0,0 +1,86 @@
+import itertools
+import random
+import time
+
+import pytest
+
+from fields import NUTRIENT_FIELDS
+from meal_planner import PRICE_WEIGHT, plan_meals
+from models import UserPreferences
+from user_filters import compile_preferences, parse_goals
+
+GOALS = {"min_protein": 90, "max_calories": 1800, "max_sodium": 2000, "min_fiber": 20}
+
+def _menu(rng: random.Random, n: int) -> list:
+    return [
+        {
+            "id": i,
+            "price": round(rng.uniform(3, 14), 2),
+            "tags": rng.sample(["Vegan", "Halal", "Gluten Free"], rng.randint(0, 2)),
+            "nutrients": {f: round(rng.uniform(0, 60 if f != "calories" else 900), 1) for f in NUTRIENT_FIELDS}
+            | {"sodium": round(rng.uniform(50, 1500))},
+            "allergens": {"peanuts": rng.random() < 0.2, "gluten": rng.random() < 0.4},
+        }
+        for i in range(n)
+    ]
+
+def _brute_force(meals, goals, slots, allergies, tags, budget_per_meal, budget_per_day):
+    """Lowest score over every combination, or None if no combination satisfies the hard constraints"""
+    def eligible(meal):
+        return (
+            not any(meal["allergens"].get(a) for a in allergies)
+            and all(t in [x.lower().replace(" ", "_") for x in meal["tags"]] for t in tags)
+            and (budget_per_meal is None or meal["price"] <= budget_per_meal)
+        )
+
+    best = None
+    for combo in itertools.combinations([m for m in meals if eligible(m)], slots):
+        cost = sum(m["price"] for m in combo)
+        if budget_per_day is not None and cost > budget_per_day:
+            continue
+        penalty = 0.0
+        for nutrient, is_min, target in goals:
+            total = sum(m["nutrients"][nutrient] for m in combo)
+            gap = target - total if is_min else total - target
+            penalty += max(gap, 0.0) / target
+        score = penalty + cost * PRICE_WEIGHT
+        best = score if best is None else min(best, score)
+    return best
+
+@pytest.mark.parametrize("seed", range(8))
+def test_plan_matches_brute_force_on_a_small_menu(seed):
+    rng = random.Random(seed)
+    meals = _menu(rng, 12)
+    constraints = {
+        "allergies": ["peanuts"] if seed % 2 else [],
+        "tags": ["halal"] if seed % 4 == 3 else [],
+        "budget_per_meal": 12.0 if seed % 3 == 0 else None,
+        "budget_per_day": 25.0 if seed % 2 == 0 else None,
+    }
+    user_filter = compile_preferences(UserPreferences(
+        allergies=constraints["allergies"], dietary_tags=constraints["tags"], nutrition_goals=GOALS,
+        budget_per_meal=constraints["budget_per_meal"], budget_per_day=constraints["budget_per_day"],
+    ))
+    plan = plan_meals(meals, user_filter, slots=3, time_budget=10.0)
+    expected = _brute_force(meals, parse_goals(GOALS), 3, **constraints)
+
+    assert plan["optimal"]
+    if expected is None:
+        assert not plan["feasible"]
+    else:
+        assert plan["feasible"]
+        assert plan["score"] == pytest.approx(expected)
+        assert len({m["id"] for m in plan["meals"]}) == 3
+
+def test_plan_stops_at_the_time_budget_with_the_best_plan_so_far():
+    meals = _menu(random.Random(42), 400)
+    # Goals that are nearly, but not quite, reachable keep the bound loose for hundreds of thousands of nodes
+    goals = {"min_protein": 150, "max_sodium": 1000, "min_fiber": 60, "max_fat": 40}
+    started = time.perf_counter()
+    user_filter = compile_preferences(UserPreferences(nutrition_goals=goals))
+    plan = plan_meals(meals, user_filter, slots=6, time_budget=0.02)
+    elapsed = time.perf_counter() - started
+
+    assert not plan["optimal"]
+    assert plan["feasible"] and len(plan["meals"]) == 6
+    assert elapsed < 1.0
@@ -0,0 +1,56 @@
+from database import engine
+from menu_cache import invalidate_menu
+from metrics import REQUESTS
+from models import Meal, UserPreferences
+
+def _list_meals_statements(client, query_budget, params) -> tuple:
+    """(statements issued, meals returned) for one uncached GET /meals"""
+    invalidate_menu()  # measure the database path, not a cached body
+    with query_budget(2, max_repeats=1) as log:  # menu version + one page query
+        response = client.get("/meals", params=params)
+    assert response.status_code == 200
+    return len(log), len(response.json()["meals"])
+
+def test_list_meals_statement_count_does_not_grow_with_meals(client, make_meals, query_budget):
+    make_meals(8)
+    small = _list_meals_statements(client, query_budget, {"limit": 500})
+    make_meals(72)
+    large = _list_meals_statements(client, query_budget, {"limit": 500})
+    assert (small[1], large[1]) == (8, 80)
+    assert small[0] == large[0]
+
+def test_list_meals_filtered_statement_count_does_not_grow_with_meals(client, make_meals, query_budget):
+    make_meals(8)
+    params = {"limit": 500, "exclude_allergens": "peanuts", "max_calories": 10000, "sort": "price"}
+    small = _list_meals_statements(client, query_budget, params)
+    make_meals(72)
+    large = _list_meals_statements(client, query_budget, params)
+    assert large[1] > small[1]
+    assert small[0] == large[0]
+
+def test_list_meals_database_failure_is_a_503(client, db):
+    invalidate_menu()
+    Meal.__table__.drop(engine)
+    failures = REQUESTS.labels("GET", "/meals", "503")
+    before = failures._value.get()
+    response = client.get("/meals")
+    assert response.status_code == 503
+    assert failures._value.get() == before + 1
+
+def test_preference_lookup_failure_is_a_503(client, db, make_user):
+    user = make_user()
+    UserPreferences.__table__.drop(engine)
+    response = client.get("/meals", params={"for_user": user.id})
+    assert response.status_code == 503
+
+def test_per_user_meal_lists_are_not_publicly_cacheable(client, make_meals, make_user):
+    make_meals(3)
+    user = make_user()
+    assert client.get("/meals").headers["Cache-Control"].startswith("public")
+    personal = client.get("/meals", params={"for_user": user.id})
+    assert personal.status_code == 200
+    assert personal.headers["Cache-Control"].startswith("private")
+    assert "public" not in personal.headers["Cache-Control"]
+    revalidated = client.get("/meals", params={"for_user": user.id}, headers={"If-None-Match": personal.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["Cache-Control"].startswith("private")
@@ -0,0 +1,46 @@
+import pytest
+
+from menu_ingest import EmptyMenuError, ingest_menu
+from models import Favorite, Meal
+
+def _item(meal) -> dict:
+    return {
+        "name": meal.name, "station": meal.station, "serving_time": meal.serving_time,
+        "date_available": meal.date_available, "price": meal.price, "tags": meal.tags,
+    }
+
+def _listed(client, date) -> set:
+    response = client.get("/meals", params={"date": str(date), "limit": 500})
+    assert response.status_code == 200
+    return {meal["id"] for meal in response.json()["meals"]}
+
+def test_dropped_favorite_is_detached_from_the_menu(client, db, make_meals, make_user):
+    user = make_user()
+    favorite, plain, staying = make_meals(3)
+    date, plain_id = staying.date_available, plain.id
+    db.add(Favorite(user_id=user.id, meal_id=favorite.id))
+    db.commit()
+    ingest_menu(db, [_item(favorite), _item(plain), _item(staying)])
+
+    counts = ingest_menu(db, [_item(staying)])
+    assert (counts["removed"], counts["detached"]) == (1, 1)
+    assert db.query(Meal).filter(Meal.id == plain_id).count() == 0
+    assert _listed(client, date) == {staying.id}
+    # History still resolves the detached meal
+    assert [m["id"] for m in client.get(f"/users/{user.id}/favorites").json()] == [favorite.id]
+    assert client.get(f"/meals/{favorite.id}").status_code == 200
+
+    counts = ingest_menu(db, [_item(staying)])
+    assert (counts["removed"], counts["detached"], counts["unchanged"]) == (0, 0, 1)
+
+    # The dish comes back: the same row is listed again
+    counts = ingest_menu(db, [_item(favorite), _item(staying)])
+    assert counts["changed"] == 1
+    assert _listed(client, date) == {favorite.id, staying.id}
+
+def test_a_batch_with_no_items_for_a_date_never_empties_it(db, make_meals):
+    meals = make_meals(3)
+    date = meals[0].date_available
+    with pytest.raises(EmptyMenuError):
+        ingest_menu(db, [], dates=[date])
+    assert db.query(Meal).filter(Meal.date_available == date).count() == 3
@@ -0,0 +1,43 @@
+import threading
+
+from scrape_jobs import CANCELLED, SUCCEEDED, ScrapeJobRunner
+
+def test_jobs_are_shared_and_single_flight_across_workers(db):
+    release = threading.Event()
+
+    def target(job, session):
+        job.report(0, 2, "Working")
+        release.wait(5)
+        return {"meals_processed": 2}
+
+    # Two runners with the same database stand in for two uvicorn workers
+    first, second = ScrapeJobRunner(target), ScrapeJobRunner(target)
+    job, created = first.submit()
+    assert created
+    again, created = second.submit()
+    assert not created and again["job_id"] == job["job_id"]
+    assert second.get(job["job_id"])["job_id"] == job["job_id"]
+
+    release.set()
+    first.wait()
+    finished = second.get(job["job_id"])
+    assert finished["status"] == SUCCEEDED
+    assert finished["result"] == {"meals_processed": 2}
+    assert second.submit()[1]
+
+def test_cancel_from_another_worker_stops_the_running_job(db):
+    started, stop = threading.Event(), threading.Event()
+
+    def target(job, session):
+        started.set()
+        while not stop.wait(0.01):
+            job.check_cancelled()
+        return {}
+
+    first, second = ScrapeJobRunner(target), ScrapeJobRunner(target)
+    job, _ = first.submit()
+    assert started.wait(5)
+    assert second.cancel(job["job_id"])["cancel_requested"]
+    first.wait()
+    stop.set()
+    assert first.get(job["job_id"])["status"] == CANCELLED
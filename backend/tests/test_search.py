@@ -0,0 +1,22 @@
+import menu_cache
+from meal_search import get_search_index
+from models import Meal
+
+def _search(client, q):
+    response = client.get("/meals/search", params={"q": q})
+    assert response.status_code == 200
+    return [meal["name"] for meal in response.json()["results"]]
+
+def test_search_index_follows_writes_from_other_workers(client, db, make_meals, monkeypatch):
+    monkeypatch.setattr(menu_cache, "MENU_VERSION_TTL", 0.0)
+    make_meals(3)
+    before = get_search_index(db)
+    assert get_search_index(db) is before
+
+    # Another worker's write: the shared version changes, this process's caches are untouched
+    db.add(Meal(name="Shawarma Plate", station="Grill", date_available=make_meals(1)[0].date_available))
+    menu_cache.bump_menu_version(db)
+    db.commit()
+
+    assert get_search_index(db) is not before
+    assert _search(client, "shawarma") == ["Shawarma Plate"]
@@ -0,0 +1,57 @@
+"""The read endpoints hand-serialize rows with orjson; their bodies must match what
+response_model validation would have produced."""
+import json
+
+from pydantic import TypeAdapter
+from sqlalchemy.orm import selectinload
+
+from api_meals import meal_to_dict
+from models import Favorite, Meal
+from schemas import MealListResponse, MealSchema
+
+def _expected(db, meal_ids) -> list:
+    """What the ORM path (meal_to_dict validated by MealSchema) returns for meal_ids, in order"""
+    meals = {
+        meal.id: meal
+        for meal in db.query(Meal).options(selectinload(Meal.nutrients), selectinload(Meal.allergens)).filter(Meal.id.in_(meal_ids))
+    }
+    return [MealSchema.model_validate(meal_to_dict(meals[i])).model_dump(mode="json") for i in meal_ids]
+
+def _odd_meals(db, make_meals) -> list:
+    """Regular meals plus the shapes most likely to drift: no child rows, nulls, whole-number floats"""
+    meals = make_meals(3)
+    bare = Meal(name="Bare", date_available=meals[0].date_available)
+    whole = Meal(name="Whole", station="Grill", serving_time="Dinner", date_available=meals[0].date_available, price=5, tags=[])
+    db.add_all([bare, whole])
+    db.commit()
+    return meals + [bare, whole]
+
+def test_list_meals_body_matches_meal_list_response(client, db, make_meals):
+    _odd_meals(db, make_meals)
+    body = client.get("/meals", params={"limit": 3}).content
+    parsed = MealListResponse.model_validate_json(body, strict=True)
+    assert json.loads(body) == parsed.model_dump(mode="json")
+    assert parsed.next_cursor is not None
+
+    rest = client.get("/meals", params={"limit": 3, "cursor": parsed.next_cursor}).content
+    meals = json.loads(body)["meals"] + json.loads(rest)["meals"]
+    assert meals == _expected(db, [meal["id"] for meal in meals])
+    assert len(meals) == 5
+
+def test_get_meal_body_matches_meal_schema(client, db, make_meals):
+    for meal in _odd_meals(db, make_meals):
+        body = client.get(f"/meals/{meal.id}").content
+        assert json.loads(body) == MealSchema.model_validate_json(body, strict=True).model_dump(mode="json")
+        assert json.loads(body) == _expected(db, [meal.id])[0]
+
+def test_favorites_body_matches_meal_schema_list(client, db, make_meals, make_user):
+    user = make_user()
+    meals = _odd_meals(db, make_meals)
+    db.add_all([Favorite(user_id=user.id, meal_id=meal.id) for meal in meals])
+    db.commit()
+    body = client.get(f"/users/{user.id}/favorites").content
+    parsed = TypeAdapter(list[MealSchema]).validate_json(body, strict=True)
+    assert json.loads(body) == [meal.model_dump(mode="json") for meal in parsed]
+    ids = [meal["id"] for meal in json.loads(body)]
+    assert json.loads(body) == _expected(db, ids)
+    assert sorted(ids) == sorted(meal.id for meal in meals)
@@ -0,0 +1,48 @@
+import datetime
+
+import pytest
+
+from models import Favorite
+
+def _favorite(db, user, meals):
+    for i, meal in enumerate(meals):
+        db.add(Favorite(user_id=user.id, meal_id=meal.id, date_favorited=datetime.date(2024, 1, 1) + datetime.timedelta(days=i % 10)))
+    db.commit()
+
+@pytest.mark.parametrize("favorites", [1, 60])
+def test_favorites_statement_count_is_fixed(client, db, make_meals, make_user, query_budget, favorites):
+    user = make_user()
+    _favorite(db, user, make_meals(favorites))
+    url = f"/users/{user.id}/favorites"
+    with query_budget(1):
+        response = client.get(url, params={"limit": 200})
+    assert response.status_code == 200
+    assert len(response.json()) == favorites
+    assert "X-Next-Cursor" not in response.headers
+
+def test_favorites_cursor_walks_every_page_once(client, db, make_meals, make_user, query_budget):
+    user = make_user()
+    _favorite(db, user, make_meals(55))
+    url = f"/users/{user.id}/favorites"
+
+    seen, pages, cursor = [], 0, None
+    while True:
+        params = {"limit": 20, **({"cursor": cursor} if cursor else {})}
+        with query_budget(1):
+            response = client.get(url, params=params)
+        assert response.status_code == 200
+        seen += [meal["id"] for meal in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert pages == 3
+    # Newest first, ties broken by the most recent favorite, nothing repeated or skipped
+    expected = db.query(Favorite.meal_id).order_by(Favorite.date_favorited.desc(), Favorite.id.desc())
+    assert seen == [meal_id for meal_id, in expected]
+
+def test_favorites_rejects_a_malformed_cursor(client, make_user):
+    user = make_user()
+    response = client.get(f"/users/{user.id}/favorites", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,118 @@
+"""Compiled per-user preference filters, cached across requests.
+
+UserPreferences stores loose JSON: allergy names in any spelling, free-form
+dietary tags and "min_protein"-style goal keys. compile_preferences() turns
+a row into a UserFilter once:
+  * allergen_mask   bitmask over ALLERGEN_FIELDS (same layout as MenuMatrix)
+  * tags            frozenset of normalized tag ids ("gluten_free")
+  * goals           typed (nutrient, is_min, daily target) bounds
+  * budgets         floats or None
+which can be applied as SQL conditions on meal_rows_query() (where()) or to
+MealSchema-shaped dicts (matches()), and which the meal planner and
+MenuMatrix.compile() take as is.
+
+get_user_filter() keeps compiled filters in a bounded LRU, and
+set_preferences drops the user's entry through invalidate_user_filter().
+Each worker process has its own cache, so other workers can serve the old
+filter for up to PREFERENCE_CACHE_TTL seconds.
+"""
+import os
+
+from sqlalchemy import String, func, or_, select
+from sqlalchemy.orm import Session
+
+from fields import ALLERGEN_FIELDS, NUTRIENT_FIELDS, escape_like, normalize_name
+from menu_cache import TTLCache
+from menu_matrix import allergen_bits
+from models import Allergen, Meal, UserPreferences
+
+PREFERENCE_CACHE_SIZE = int(os.getenv("PREFERENCE_CACHE_SIZE", "10000"))
+PREFERENCE_CACHE_TTL = float(os.getenv("PREFERENCE_CACHE_TTL", "300"))
+
+def parse_goals(nutrition_goals) -> list:
+    """Turn {"min_protein": 30, "max_sodium": 1000} into [(nutrient, is_min, target)]"""
+    goals = []
+    for key, target in (nutrition_goals or {}).items():
+        bound, _, nutrient = key.partition("_")
+        if bound in ("min", "max") and nutrient in NUTRIENT_FIELDS and target and target > 0:
+            goals.append((nutrient, bound == "min", float(target)))
+    return goals
+
+class UserFilter:
+    __slots__ = ("allergen_mask", "allergens", "tags", "goals", "budget_per_meal", "budget_per_day")
+
+    def __init__(self, allergen_mask: int = 0, tags=(), goals=(), budget_per_meal=None, budget_per_day=None):
+        self.allergen_mask = allergen_mask
+        self.allergens = tuple(f for i, f in enumerate(ALLERGEN_FIELDS) if allergen_mask & (1 << i))
+        self.tags = frozenset(tags)
+        self.goals = tuple(goals)
+        self.budget_per_meal = budget_per_meal
+        self.budget_per_day = budget_per_day
+
+    @property
+    def key(self) -> tuple:
+        """Hashable identity of the hard constraints, for response cache keys"""
+        return (self.allergen_mask, tuple(sorted(self.tags)), self.budget_per_meal)
+
+    def allergen_conditions(self) -> list:
+        return [or_(getattr(Allergen, a).is_(None), getattr(Allergen, a) == False) for a in self.allergens]  # noqa: E712
+
+    def where(self) -> list:
+        """Conditions for a meal_rows_query() (which joins the allergens row) keeping only eligible meals"""
+        conditions = self.allergen_conditions()
+        if self.tags:
+            # Normalize the serialized JSON the same way tags are, then match the quoted element
+            normalized = func.replace(func.replace(func.lower(Meal.tags.cast(String)), " ", "_"), "-", "_")
+            conditions += [normalized.like(f'%"{escape_like(tag)}"%', escape="\\") for tag in sorted(self.tags)]
+        if self.budget_per_meal is not None:
+            conditions.append(func.coalesce(Meal.price, 0.0) <= self.budget_per_meal)
+        return conditions
+
+    def matches(self, meal: dict) -> bool:
+        """In-memory equivalent of where() for a MealSchema-shaped dict"""
+        allergens = meal.get("allergens") or {}
+        if any(allergens.get(a) for a in self.allergens):
+            return False
+        if self.tags and not self.tags <= {normalize_name(t) for t in meal.get("tags") or []}:
+            return False
+        if self.budget_per_meal is not None and (meal.get("price") or 0.0) > self.budget_per_meal:
+            return False
+        return True
+
+NO_PREFERENCES = UserFilter()
+
+def compile_preferences(prefs) -> UserFilter:
+    """UserFilter for a UserPreferences row (or None, meaning no constraints)"""
+    if prefs is None:
+        return NO_PREFERENCES
+    return UserFilter(
+        allergen_mask=allergen_bits(prefs.allergies),
+        tags=[normalize_name(t) for t in prefs.dietary_tags or [] if t and t.strip()],
+        goals=parse_goals(prefs.nutrition_goals),
+        budget_per_meal=prefs.budget_per_meal,
+        budget_per_day=prefs.budget_per_day,
+    )
+
+preference_cache = TTLCache(maxsize=PREFERENCE_CACHE_SIZE, ttl=PREFERENCE_CACHE_TTL)
+
+def _preferences_query(user_id: int):
+    return select(UserPreferences).where(UserPreferences.user_id == user_id)
+
+async def get_user_filter(db, user_id: int) -> UserFilter:
+    """Compiled filter for a user from an AsyncSession; one cache lookup when warm"""
+    compiled = preference_cache.get(user_id)
+    if compiled is None:
+        compiled = compile_preferences(await db.scalar(_preferences_query(user_id)))
+        preference_cache.set(user_id, compiled)
+    return compiled
+
+def load_user_filter(db: Session, user_id: int) -> UserFilter:
+    """Sync counterpart of get_user_filter(), for code running on a plain Session"""
+    compiled = preference_cache.get(user_id)
+    if compiled is None:
+        compiled = compile_preferences(db.scalar(_preferences_query(user_id)))
+        preference_cache.set(user_id, compiled)
+    return compiled
+
+def invalidate_user_filter(user_id: int):
+    preference_cache.discard(user_id)
@@ -43,21 +43,30 @@ export default function MealsPage() {
   const [error, setError] = useState<string | null>(null);
   const [selectedMeal, setSelectedMeal] = useState<Meal | null>(null);
   const [isModalOpen, setIsModalOpen] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
 
-  useEffect(() => {
-    fetch('http://localhost:8000/meals')
+  const fetchMeals = (cursor?: string) => {
+    const url = cursor
+      ? `http://localhost:8000/meals?cursor=${encodeURIComponent(cursor)}`
+      : 'http://localhost:8000/meals';
+    fetch(url)
       .then((res) => {
         if (!res.ok) throw new Error('Failed to fetch meals');
         return res.json();
       })
       .then((data) => {
-        setMeals(data.meals || []);
+        setMeals((prev) => (cursor ? [...prev, ...(data.meals || [])] : data.meals || []));
+        setNextCursor(data.next_cursor || null);
         setLoading(false);
       })
       .catch((err) => {
         setError(err.message);
         setLoading(false);
       });
+  };
+
+  useEffect(() => {
+    fetchMeals();
   }, []);
 
   const openModal = (meal: Meal) => {
@@ -129,6 +138,15 @@ export default function MealsPage() {
         ))}
       </ul>
 
+      {nextCursor && (
+        <button
+          className="mt-6 px-4 py-2 bg-blue-600 text-white rounded hover:bg-blue-700"
+          onClick={() => fetchMeals(nextCursor)}
+        >
+          Load more
+        </button>
+      )}
+
       {/* Meal Detail Modal */}
       <MealDetailModal
         meal={selectedMeal}